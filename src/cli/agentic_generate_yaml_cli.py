@@ -50,6 +50,8 @@ class AgentContext:
     current_stage: Optional[str] = None
     selected_tables: List[str] = None
     dictionary_content: Optional[str] = None
+    dictionary_validation_id: Optional[str] = None
+    dictionary_file: Optional[str] = None
     
     def __post_init__(self):
         if self.selected_tables is None:
@@ -11,8 +11,27 @@ from typing import List, Optional
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../../..')))
 
 from src.functions.metadata_functions import list_tables
-from src.functions.dictionary_functions import generate_data_dictionary
-from src.functions.stage_functions import save_dictionary_to_stage
+from src.functions.dictionary_functions import generate_data_dictionary, get_dictionary_validation
+from src.functions.stage_functions import save_dictionary_file_to_stage, save_dictionary_to_stage
+
+# How long an upload waits for a still-running schema validation before reporting it pending
+VALIDATION_WAIT_SECONDS = 10
+
+
+def _validation_summary(agent_context, timeout: Optional[float] = None) -> str:
+    """One-line schema validation verdict for the generated dictionary"""
+    validation_id = getattr(agent_context, 'dictionary_validation_id', None)
+    if not validation_id:
+        return ""
+    
+    result = get_dictionary_validation(validation_id, timeout=timeout)
+    if result["status"] != "success":
+        return ""
+    if result["validation_status"] == "valid":
+        return "\n🔎 Schema validation: passed"
+    if result["validation_status"] == "invalid":
+        return f"\n⚠️ Schema validation failed: {result['validation_error']}"
+    return "\n⏳ Schema validation still running - it is checked again on upload"
 
 
 def get_tables_impl(agent_context) -> str:
@@ -135,15 +154,20 @@ def generate_yaml_dictionary_impl(agent_context, output_filename: Optional[str]
         
         if result["status"] == "success":
             agent_context.dictionary_content = result["yaml_dictionary"]
+            # Protobuf validation runs in the background; its verdict is reported when ready
+            agent_context.dictionary_validation_id = result.get("validation_id")
+            agent_context.dictionary_file = None
+            validation = _validation_summary(agent_context)
             
             # Save to file if filename provided
             if output_filename:
                 with open(output_filename, 'w') as f:
                     f.write(result["yaml_dictionary"])
+                agent_context.dictionary_file = output_filename
                 
-                return f"✅ Dictionary generated successfully!\n📄 Saved to: {output_filename}\n📊 Tables processed: {result.get('tables_processed', len(agent_context.selected_tables))}"
+                return f"✅ Dictionary generated successfully!\n📄 Saved to: {output_filename}\n📊 Tables processed: {result.get('tables_processed', len(agent_context.selected_tables))}{validation}"
             else:
-                return f"✅ Dictionary generated successfully!\n📊 Tables processed: {result.get('tables_processed', len(agent_context.selected_tables))}\n💡 Use save_dictionary() to save to file"
+                return f"✅ Dictionary generated successfully!\n📊 Tables processed: {result.get('tables_processed', len(agent_context.selected_tables))}{validation}\n💡 Use save_dictionary() to save to file"
         else:
             return f"❌ Failed to generate dictionary: {result.get('error', 'Unknown error')}"
             
@@ -159,6 +183,7 @@ def save_dictionary_impl(agent_context, filename: str) -> str:
     try:
         with open(filename, 'w') as f:
             f.write(agent_context.dictionary_content)
+        agent_context.dictionary_file = filename
         return f"✅ Dictionary saved to: {filename}"
     except Exception as e:
         return f"❌ Failed to save dictionary: {str(e)}"
@@ -179,15 +204,26 @@ def upload_to_stage_impl(agent_context, stage_name: str, filename: str) -> str:
     qualified_stage_name = f"@{agent_context.current_database}.{agent_context.current_schema}.{stage_name}"
     
     try:
-        result = save_dictionary_to_stage(
-            agent_context.connection_id,
-            qualified_stage_name,
-            filename,
-            agent_context.dictionary_content
-        )
+        # PUT stages a file under its own name, so a saved copy is uploaded straight from
+        # disk when it already has the requested name; otherwise upload the content
+        dictionary_file = getattr(agent_context, 'dictionary_file', None)
+        if dictionary_file and os.path.basename(dictionary_file) == filename and os.path.isfile(dictionary_file):
+            result = save_dictionary_file_to_stage(
+                agent_context.connection_id,
+                qualified_stage_name,
+                dictionary_file
+            )
+        else:
+            result = save_dictionary_to_stage(
+                agent_context.connection_id,
+                qualified_stage_name,
+                filename,
+                agent_context.dictionary_content
+            )
         
         if result["status"] == "success":
-            return f"✅ Dictionary uploaded to stage: {stage_name}/{filename}"
+            validation = _validation_summary(agent_context, timeout=VALIDATION_WAIT_SECONDS)
+            return f"✅ Dictionary uploaded to stage: {stage_name}/{result.get('file_name', filename)}{validation}"
         else:
             return f"❌ Failed to upload to stage: {result.get('error', 'Unknown error')}"
             
@@ -47,15 +47,16 @@ def get_yaml_files_impl(agent_context) -> str:
     if not agent_context.current_stage:
         return "❌ No stage selected. Please select a stage first."
     
-    result = list_stage_files(agent_context.connection_id, agent_context.current_stage)
+    # Let Snowflake filter the listing instead of pulling every file in the stage;
+    # dictionaries saved from here are gzipped on upload, so accept the .gz form too
+    result = list_stage_files(agent_context.connection_id, agent_context.current_stage, pattern=r".*\.ya?ml(\.gz)?")
     if result["status"] == "success":
-        files = result["files"]
-        yaml_files = [f for f in files if f["name"].endswith(('.yaml', '.yml'))]
+        yaml_files = result["files"]
         if yaml_files:
             file_info = [f"{f['name'].split('/')[-1]} ({f['size']} bytes)" for f in yaml_files]
             return f"📄 Found {len(yaml_files)} YAML files: {', '.join(file_info)}"
         else:
-            return f"❌ No YAML files found. Available files: {[f['name'] for f in files]}"
+            return f"❌ No YAML files found in {agent_context.current_stage}"
     else:
         return f"❌ Failed to get files: {result.get('error', 'Unknown error')}"
 
@@ -75,7 +76,7 @@ def load_yaml_file_impl(agent_context, filename: str) -> str:
     
     # Parse YAML
     try:
-        yaml_data = yaml.safe_load(yaml_content)
+        yaml_data = result["parsed"]
         agent_context.yaml_content = yaml_content
         agent_context.yaml_data = yaml_data
         
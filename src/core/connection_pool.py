@@ -0,0 +1,206 @@
+"""
+Connection pool - Bounded pool of Snowflake connections sharing one set of credentials
+"""
+
+import hashlib
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Any, List, Optional, Tuple
+import snowflake.connector
+
+# Default pool sizing; each pooled connection is a separate Snowflake session
+POOL_MAX_SIZE = 20
+POOL_TIMEOUT = 30
+
+# Pooled sessions unused for this long are closed, down to one kept warm per pool
+POOL_IDLE_TIMEOUT = 600
+
+# Sessions idle longer than the keep-alive heartbeat are checked with SELECT 1 before reuse
+POOL_PRE_PING_IDLE = 900
+
+
+class SnowflakeConnectionPool:
+    """Hands out Snowflake connections so concurrent calls are not serialized on one session"""
+
+    def __init__(self, conn_params: Dict[str, Any], max_size: int = POOL_MAX_SIZE,
+                 timeout: float = POOL_TIMEOUT):
+        self._conn_params = conn_params
+        self._max_size = max_size
+        self._timeout = timeout
+        # Stack of (released_at, conn); popping from the end hands out the most recently
+        # used (warm) session first
+        self._idle: List[Tuple[float, Any]] = []
+        self._size = 0
+        self._closed = False
+        self._lock = threading.Lock()
+        # Signalled whenever a session is released or a slot frees up, to wake waiters
+        self._available = threading.Condition(self._lock)
+
+    @property
+    def size(self) -> int:
+        """Number of open connections, idle or checked out"""
+        return self._size
+
+    def acquire(self, timeout: Optional[float] = None):
+        """Check out an idle connection, opening a new one while under max_size"""
+        deadline = time.monotonic() + (self._timeout if timeout is None else timeout)
+        while True:
+            with self._available:
+                while True:
+                    if self._closed:
+                        raise Exception("Connection pool is closed")
+                    if self._idle:
+                        released_at, conn = self._idle.pop()
+                        break
+                    if self._size < self._max_size:
+                        self._size += 1
+                        conn = None
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise Exception("Timed out waiting for a pooled Snowflake connection")
+                    self._available.wait(remaining)
+
+            if conn is None:
+                try:
+                    return snowflake.connector.connect(**self._conn_params)
+                except Exception:
+                    with self._available:
+                        self._size -= 1
+                        self._available.notify()
+                    raise
+
+            if self._is_usable(conn, released_at):
+                return conn
+            # Dropping the dead session frees a slot, so the next pass can open a fresh one
+            self._discard(conn)
+
+    def _is_usable(self, conn, released_at: float) -> bool:
+        """Whether an idle session can be handed out, pinging it only if idle past the heartbeat"""
+        if conn.is_closed():
+            return False
+        if time.monotonic() - released_at < POOL_PRE_PING_IDLE:
+            return True
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SELECT 1")
+            cursor.fetchone()
+            cursor.close()
+            return True
+        except Exception:
+            return False
+
+    def ping_idle(self) -> Optional[bool]:
+        """Check idle sessions without opening a new one: True once one is usable, False if the
+        pool is closed or every idle session was dead, None if no session was idle to check"""
+        checked = False
+        while True:
+            with self._available:
+                if self._closed:
+                    return False
+                if not self._idle:
+                    return False if checked else None
+                released_at, conn = self._idle.pop()
+            checked = True
+            if self._is_usable(conn, released_at):
+                with self._available:
+                    # Keep the original release time so the ping does not hold off trim_idle
+                    self._idle.append((released_at, conn))
+                    self._available.notify()
+                return True
+            self._discard(conn)
+
+    def release(self, conn):
+        """Return a connection to the pool, dropping it if it or the pool has been closed"""
+        if not conn.is_closed():
+            with self._available:
+                if not self._closed:
+                    self._idle.append((time.monotonic(), conn))
+                    self._available.notify()
+                    return
+        self._discard(conn)
+
+    @contextmanager
+    def connection(self):
+        """Context manager that acquires a connection and always releases it"""
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def _discard(self, conn):
+        """Close a connection taken out of the pool and stop counting it"""
+        with self._available:
+            self._size -= 1
+            # The freed slot lets a waiter open a new session instead of sleeping to its timeout
+            self._available.notify()
+        try:
+            conn.close()
+        except Exception:
+            pass  # Connection is already dead
+
+    def trim_idle(self, max_idle: float = POOL_IDLE_TIMEOUT) -> int:
+        """Close idle connections unused for max_idle seconds, keeping the most recent one"""
+        cutoff = time.monotonic() - max_idle
+        with self._available:
+            # The newest session (last) always stays so the pool keeps one warm
+            stale = [item for item in self._idle[:-1] if item[0] <= cutoff]
+            self._idle = [item for item in self._idle[:-1] if item[0] > cutoff] + self._idle[-1:]
+        for _, conn in stale:
+            self._discard(conn)
+        return len(stale)
+
+    def close(self):
+        """Close every idle connection; checked-out ones are closed as they are released"""
+        with self._available:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            # Waiters re-check _closed and fail fast instead of waiting out their timeout
+            self._available.notify_all()
+        for _, conn in idle:
+            self._discard(conn)
+
+
+# Pools shared by every connection ID opened with the same credentials, with reference counts
+_shared_pools: Dict[str, SnowflakeConnectionPool] = {}
+_shared_refs: Dict[str, int] = {}
+_shared_lock = threading.Lock()
+
+
+def credential_key(conn_params: Dict[str, Any]) -> str:
+    """Stable hash of connection parameters, so identical credentials map to one pool"""
+    return hashlib.sha256(repr(sorted(conn_params.items())).encode()).hexdigest()
+
+
+def acquire_shared_pool(conn_params: Dict[str, Any]) -> SnowflakeConnectionPool:
+    """Return the pool for these credentials, creating it on first use, and take a reference"""
+    key = credential_key(conn_params)
+    with _shared_lock:
+        pool = _shared_pools.get(key)
+        if pool is None:
+            pool = _shared_pools[key] = SnowflakeConnectionPool(conn_params)
+            _shared_refs[key] = 0
+        _shared_refs[key] += 1
+        return pool
+
+
+def release_shared_pool(key: str):
+    """Drop a reference taken by acquire_shared_pool, closing the pool when none remain"""
+    with _shared_lock:
+        if key not in _shared_refs:
+            return
+        _shared_refs[key] -= 1
+        if _shared_refs[key] > 0:
+            return
+        del _shared_refs[key]
+        pool = _shared_pools.pop(key)
+    pool.close()
+
+
+def trim_shared_pools(max_idle: float = POOL_IDLE_TIMEOUT) -> int:
+    """Close long-idle sessions in every shared pool; returns how many were closed"""
+    with _shared_lock:
+        pools = list(_shared_pools.values())
+    return sum(pool.trim_idle(max_idle) for pool in pools)
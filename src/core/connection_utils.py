@@ -1,34 +1,205 @@
+import logging
 import os
+import threading
+import time
 import uuid
-from typing import Dict, Any, Optional
-import snowflake.connector
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Dict, Any, List, Optional
 from dotenv import load_dotenv
 
+from src.core.connection_pool import (
+    POOL_MAX_SIZE, acquire_shared_pool, credential_key, release_shared_pool, trim_shared_pools
+)
+from src.core.ttl_cache import invalidate_connection_caches
+
 # Load environment variables
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
+# Connections unused for longer than this (seconds) are closed by reap_idle_connections
+CONNECTION_IDLE_TTL = 3600
+
+# At most this many connections are kept; storing more closes the least recently used
+CONNECTION_STORE_SIZE = 512
+
+# How often (seconds) the background reaper looks for idle connections
+REAPER_INTERVAL = 300
+
+# Shared worker threads for fan-out queries, capped at the pool size so a burst queues
+# here instead of oversubscribing sessions and threads
+db_executor = ThreadPoolExecutor(max_workers=POOL_MAX_SIZE, thread_name_prefix="snowflake-worker")
+
+_reaper_thread: Optional[threading.Thread] = None
+_reaper_lock = threading.Lock()
+
+class ConnectionRegistry:
+    """Thread-safe store of connection data by ID, kept in least-recently-used order"""
+    
+    def __init__(self, maxsize: int = CONNECTION_STORE_SIZE):
+        self.maxsize = maxsize
+        self._data: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        # Guards every read/write so a remove cannot race a lookup or an iteration
+        self._lock = threading.RLock()
+    
+    def get(self, connection_id: str) -> Optional[Dict[str, Any]]:
+        """Return connection data and mark it as used, or None if unknown"""
+        with self._lock:
+            connection_data = self._data.get(connection_id)
+            if connection_data is not None:
+                connection_data["last_used"] = time.monotonic()
+                self._data.move_to_end(connection_id)
+            return connection_data
+    
+    def set(self, connection_id: str, connection_data: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Store connection data, returning the least recently used entries evicted over maxsize"""
+        with self._lock:
+            self._data[connection_id] = connection_data
+            self._data.move_to_end(connection_id)
+            evicted = []
+            while len(self._data) > self.maxsize:
+                evicted.append(self._data.popitem(last=False)[1])
+            return evicted
+    
+    def pop(self, connection_id: str) -> Optional[Dict[str, Any]]:
+        """Remove and return connection data, or None if unknown"""
+        with self._lock:
+            return self._data.pop(connection_id, None)
+    
+    def pop_idle(self, max_idle: float) -> List[Dict[str, Any]]:
+        """Remove and return every entry unused for longer than max_idle seconds"""
+        now = time.monotonic()
+        with self._lock:
+            expired = [cid for cid, data in self._data.items()
+                       if now - data.get("last_used", now) > max_idle]
+            return [self._data.pop(cid) for cid in expired]
+    
+    def ids_sharing_pool(self, connection_id: str) -> List[str]:
+        """IDs of every entry with the same credentials (so the same pool) as connection_id"""
+        with self._lock:
+            connection_data = self._data.get(connection_id)
+            if connection_data is None:
+                return [connection_id]
+            key = connection_data.get("credential_key")
+            return [cid for cid, data in self._data.items() if data.get("credential_key") == key]
+    
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._data)
+
 # Global connection store - shared across all modules
-snowflake_connections: Dict[str, Dict[str, Any]] = {}
+snowflake_connections = ConnectionRegistry()
 
 def get_connection(connection_id: str) -> Optional[Dict[str, Any]]:
     """Get connection by ID"""
     return snowflake_connections.get(connection_id)
 
-def get_snowflake_connection(connection_id: str):
-    """Get the actual Snowflake connection object, with error handling"""
-    if connection_id not in snowflake_connections:
+def require_connection(connection_id: str) -> Dict[str, Any]:
+    """Get connection by ID, raising if it does not exist"""
+    connection_data = get_connection(connection_id)
+    if connection_data is None:
         raise Exception("Connection not found")
     
-    return snowflake_connections[connection_id]["connection"]
+    return connection_data
+
+def qualify_table_name(connection_data: Dict[str, Any], table_name: str) -> str:
+    """Prefix a bare table name with the connection's default database and schema"""
+    database = connection_data.get("database", "")
+    schema = connection_data.get("schema", "")
+    if "." not in table_name and database and schema:
+        return f"{database}.{schema}.{table_name}"
+    return table_name
+
+@contextmanager
+def pooled_connection(connection_id: str):
+    """Check a connection out of the pool for connection_id for the duration of a block"""
+    pool = require_connection(connection_id).get("pool")
+    if pool is None:
+        raise Exception("Connection not found")
+    
+    with pool.connection() as conn:
+        yield conn
+
+def close_connection_data(connection_data: Dict[str, Any]):
+    """Release a stored connection's share of its pool; safe to call more than once"""
+    # Popping makes a second close (e.g. disconnect racing the reaper) a no-op
+    if connection_data.pop("pool", None) is not None:
+        # Closing the last reference tears down every session over the network, so do it
+        # on a worker thread instead of blocking disconnect, eviction or the reaper
+        db_executor.submit(release_shared_pool, connection_data["credential_key"])
 
 def store_connection(connection_id: str, connection_data: Dict[str, Any]):
     """Store connection data"""
-    snowflake_connections[connection_id] = connection_data
+    connection_data["last_used"] = time.monotonic()
+    evicted = snowflake_connections.set(connection_id, connection_data)
+    for evicted_data in evicted:
+        close_connection_data(evicted_data)
+    
+    # New sessions are the natural point to drop ones nobody is using any more
+    reap_idle_connections()
+    start_connection_reaper()
 
 def remove_connection(connection_id: str):
     """Remove connection from store"""
-    if connection_id in snowflake_connections:
-        del snowflake_connections[connection_id]
+    snowflake_connections.pop(connection_id)
+
+def shared_connection_ids(connection_id: str) -> List[str]:
+    """IDs of every stored connection sharing connection_id's pool, itself included"""
+    return snowflake_connections.ids_sharing_pool(connection_id)
+
+def invalidate_shared_caches(connection_id: str) -> int:
+    """Drop cached metadata, samples and results for every connection on the same account"""
+    # Caches are keyed by connection ID, but a change made through one ID is visible to
+    # every other ID sharing its credentials
+    return sum(invalidate_connection_caches(cid) for cid in shared_connection_ids(connection_id))
+
+def ping_connection(connection_data: Dict[str, Any]):
+    """Confirm the connection still works using an idle pooled session, without logging in again"""
+    pool = connection_data.get("pool")
+    if pool is None:
+        raise Exception("Connection is closed")
+    
+    # An idle session is checked locally, with a SELECT 1 only if it has been idle past the
+    # keep-alive heartbeat. With none idle (all checked out, or none opened yet) the open
+    # pool is reported as alive rather than paying for a new Snowflake login
+    if pool.ping_idle() is False:
+        raise Exception("Connection is closed")
+
+def reap_idle_connections(max_idle: float = CONNECTION_IDLE_TTL) -> int:
+    """Close and remove connections idle for longer than max_idle seconds"""
+    reaped = snowflake_connections.pop_idle(max_idle)
+    for connection_data in reaped:
+        close_connection_data(connection_data)
+    
+    return len(reaped)
+
+def _reap_periodically(interval: float):
+    """Reaper thread body: close idle connections and pooled sessions every interval seconds"""
+    while True:
+        time.sleep(interval)
+        try:
+            reaped = reap_idle_connections()
+            if reaped:
+                logger.debug("Closed %d idle connections", reaped)
+            trimmed = trim_shared_pools()
+            if trimmed:
+                logger.debug("Closed %d idle pooled sessions", trimmed)
+        except Exception:
+            logger.exception("Connection reaper error")
+
+def start_connection_reaper(interval: float = REAPER_INTERVAL):
+    """Start the daemon thread that closes idle connections, once per process"""
+    global _reaper_thread
+    with _reaper_lock:
+        if _reaper_thread is None:
+            # Without it, idle connections are only reaped when a new one is stored
+            _reaper_thread = threading.Thread(
+                target=_reap_periodically, args=(interval,),
+                name="snowflake-connection-reaper", daemon=True
+            )
+            _reaper_thread.start()
 
 def create_snowflake_connection():
     """Create a new Snowflake connection using environment variables"""
@@ -40,7 +211,10 @@ def create_snowflake_connection():
         "warehouse": os.getenv("SNOWFLAKE_WAREHOUSE"),
         "database": os.getenv("SNOWFLAKE_DATABASE"),
         "schema": os.getenv("SNOWFLAKE_SCHEMA"),
-        "role": os.getenv("SNOWFLAKE_ROLE")
+        "role": os.getenv("SNOWFLAKE_ROLE"),
+        # Heartbeats keep pooled sessions from expiring while they sit idle
+        "client_session_keep_alive": True,
+        "client_session_keep_alive_heartbeat_frequency": 900
     }
     
     # Validate required parameters
@@ -50,21 +224,34 @@ def create_snowflake_connection():
     # Remove None values
     conn_params = {k: v for k, v in conn_params.items() if v is not None}
     
-    # Create connection
-    conn = snowflake.connector.connect(**conn_params)
-    
-    # Test connection
-    cursor = conn.cursor()
-    cursor.execute("SELECT current_version()")
-    version = cursor.fetchone()[0]
-    cursor.close()
+    # Connections with the same credentials share one pool, so only the first pays the handshake
+    pool_key = credential_key(conn_params)
+    pool = acquire_shared_pool(conn_params)
+    try:
+        # Test connection
+        with pool.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT current_version()")
+            try:
+                # Fetching the probe as Arrow pays the connector's lazy pyarrow import and
+                # converter setup here instead of on the first user query
+                version = cursor.fetch_arrow_all().column(0)[0].as_py()
+            except Exception:
+                # pyarrow not installed (or result not in Arrow format) - use the plain row path
+                cursor.execute("SELECT current_version()")
+                version = cursor.fetchone()[0]
+            cursor.close()
+    except Exception:
+        release_shared_pool(pool_key)
+        raise
     
     # Generate connection ID
     connection_id = str(uuid.uuid4())
     
-    # Store connection
+    # Store connection; the probe session is now idle in the pool and is reused first
     connection_data = {
-        "connection": conn,
+        "pool": pool,
+        "credential_key": pool_key,
         "version": version,
         **conn_params
     }
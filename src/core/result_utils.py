@@ -0,0 +1,32 @@
+"""
+Result utilities - Turning Snowflake cursor results into pandas DataFrames or row records
+"""
+
+from typing import Any, Dict, List, Tuple
+import pandas as pd
+from snowflake.connector.errors import NotSupportedError
+
+
+def fetch_dataframe(cursor) -> pd.DataFrame:
+    """Fetch the cursor's result as a DataFrame, using the connector's Arrow path when available"""
+    try:
+        # Arrow batches convert to columns without building a Python tuple per row
+        return cursor.fetch_pandas_all()
+    except NotSupportedError:
+        # pyarrow not installed or result not in Arrow format - nothing fetched yet
+        columns = [desc[0] for desc in cursor.description]
+        return pd.DataFrame(cursor.fetchall(), columns=columns)
+
+
+def fetch_records(cursor) -> Tuple[List[str], List[Dict[str, Any]]]:
+    """Fetch the cursor's result as (columns, row dicts), building the dicts from Arrow when available"""
+    columns = [desc[0] for desc in cursor.description]
+    try:
+        # to_pylist builds every row dict in C++, with no per-row tuple or DataFrame in between
+        table = cursor.fetch_arrow_all()
+    except NotSupportedError:
+        # pyarrow not installed or result not in Arrow format (e.g. SHOW) - nothing fetched yet
+        return columns, [dict(zip(columns, row)) for row in cursor.fetchall()]
+    
+    # fetch_arrow_all returns None instead of an empty table when there are no rows
+    return columns, table.to_pylist() if table is not None else []
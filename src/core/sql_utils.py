@@ -0,0 +1,99 @@
+"""
+SQL utilities - Identifier validation for statements that cannot use bind parameters
+"""
+
+import re
+from functools import lru_cache
+from typing import List
+
+import sqlglot
+from sqlglot import exp
+
+# Row cap added to generated queries that do not set their own outer LIMIT
+DEFAULT_ROW_LIMIT = 100
+
+# Unquoted Snowflake identifier, or a double-quoted one with "" as the only escape
+_IDENTIFIER = r'(?:[A-Za-z_][A-Za-z0-9_$]{0,254}|"(?:[^"]|"")+")'
+
+_QUALIFIED_NAME_RE = re.compile(rf"{_IDENTIFIER}(?:\.{_IDENTIFIER}){{0,2}}")
+
+_IDENTIFIER_PART_RE = re.compile(_IDENTIFIER)
+
+# @stage, @db.schema.stage, @~ (user stage) or @%table (table stage), with an optional path
+_STAGE_NAME_RE = re.compile(rf"@(?:~|%?{_IDENTIFIER}(?:\.{_IDENTIFIER}){{0,2}})(?:/[A-Za-z0-9_\-./]*)?")
+
+# Statements that can add, drop or rename databases, schemas, tables or stages, after any
+# leading whitespace and --, // or /* */ comments
+_DDL_RE = re.compile(r"^(?:\s|(?:--|//)[^\n]*(?:\n|$)|/\*.*?\*/)*(?:CREATE|DROP|ALTER|UNDROP)\b",
+                     re.IGNORECASE | re.DOTALL)
+
+# Stage file paths end up inside single-quoted SQL literals
+_FILE_NAME_RE = re.compile(r"[A-Za-z0-9_\-./ ]+")
+
+
+def validate_identifier(name: str) -> str:
+    """Return name unchanged if it is a (optionally qualified) identifier, else raise ValueError"""
+    if not isinstance(name, str) or not _QUALIFIED_NAME_RE.fullmatch(name):
+        raise ValueError(f"Invalid identifier: {name!r}")
+    return name
+
+
+def split_identifier(name: str) -> List[str]:
+    """Split a qualified name into parts as Snowflake stores them (unquoted parts upper-cased)"""
+    validate_identifier(name)
+    parts = []
+    for match in _IDENTIFIER_PART_RE.finditer(name):
+        part = match.group(0)
+        if part.startswith('"'):
+            parts.append(part[1:-1].replace('""', '"'))
+        else:
+            parts.append(part.upper())
+    return parts
+
+
+def validate_stage_name(stage_name: str) -> str:
+    """Return stage_name unchanged if it is a valid stage reference, else raise ValueError"""
+    if not isinstance(stage_name, str) or not _STAGE_NAME_RE.fullmatch(stage_name):
+        raise ValueError(f"Invalid stage name: {stage_name!r}")
+    return stage_name
+
+
+def validate_file_name(file_name: str) -> str:
+    """Return file_name unchanged if it is safe to embed in a stage path, else raise ValueError"""
+    if not isinstance(file_name, str) or not _FILE_NAME_RE.fullmatch(file_name) or ".." in file_name:
+        raise ValueError(f"Invalid file name: {file_name!r}")
+    return file_name
+
+
+def is_ddl(sql: str) -> bool:
+    """Whether a statement may change the objects that SHOW/LIST metadata reports"""
+    return bool(_DDL_RE.match(sql))
+
+
+def quote_identifier(name: str) -> str:
+    """Double-quote an identifier returned by Snowflake (e.g. a DESCRIBE column name)"""
+    return '"' + name.replace('"', '""') + '"'
+
+
+@lru_cache(maxsize=512)
+def _parse_sql(sql: str):
+    """Parse one Snowflake statement; cached because the same generated SQL is often re-run"""
+    return sqlglot.parse_one(sql, read="snowflake")
+
+
+def ensure_limit(sql: str, limit: int = DEFAULT_ROW_LIMIT) -> str:
+    """Add an outer LIMIT to a query that has none, leaving subquery LIMITs and non-queries alone"""
+    sql = sql.strip().rstrip(";")
+    try:
+        tree = _parse_sql(sql)
+    except sqlglot.errors.SqlglotError:
+        # Unparseable for sqlglot (parse or tokenizer error) - fall back to the keyword check
+        if "LIMIT" not in sql.upper():
+            return f"{sql}\nLIMIT {limit}"
+        return sql
+    
+    if not isinstance(tree, exp.Query) or tree.args.get("limit") is not None:
+        return sql
+    # The parse only decides whether a LIMIT is needed; the caller's SQL text is kept as is.
+    # A newline keeps the LIMIT out of a trailing -- comment
+    return f"{sql}\nLIMIT {limit}"
@@ -0,0 +1,136 @@
+"""
+TTL cache - In-process LRU caches with expiry, shared across function modules
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Hashable, Tuple
+
+# Metadata (SHOW ...) results change rarely; keep them for a minute
+METADATA_CACHE_TTL = 60
+METADATA_CACHE_SIZE = 1024
+
+# LLM answers (intent, generated SQL) are reused for an hour
+LLM_CACHE_TTL = 3600
+LLM_CACHE_SIZE = 4096
+
+# Executed NL2SQL answers are only reused briefly since the underlying data can change
+RESULT_CACHE_TTL = 300
+RESULT_CACHE_SIZE = 2048
+
+# Sample rows used to build NL2SQL prompts
+SAMPLE_CACHE_TTL = 1800
+SAMPLE_CACHE_SIZE = 1024
+
+# NL2SQL prompt prefixes; entries embed whole dictionaries so keep few of them
+PROMPT_CACHE_TTL = 1800
+PROMPT_CACHE_SIZE = 64
+
+# Background dictionary validations, kept long enough for clients to poll the verdict
+VALIDATION_CACHE_TTL = 3600
+VALIDATION_CACHE_SIZE = 256
+
+_MISSING = object()
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries expire ttl seconds after they are set"""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._inflight: Dict[Hashable, Future] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Return the cached value for key, or default if missing or expired"""
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return default
+            expires_at, value = item
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: Hashable, value: Any):
+        """Store value under key, evicting the least recently used entries over maxsize"""
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def get_or_load(self, key: Hashable, loader: Callable[[], Any]) -> Any:
+        """Return the cached value for key, calling loader at most once for concurrent misses"""
+        value = self.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+
+        # Single flight: the first caller loads, everyone else waits on its future
+        with self._lock:
+            future = self._inflight.get(key)
+            is_loader = future is None
+            if is_loader:
+                future = self._inflight[key] = Future()
+
+        if not is_loader:
+            return future.result()
+
+        try:
+            value = loader()
+        except BaseException as error:
+            with self._lock:
+                del self._inflight[key]
+            future.set_exception(error)
+            raise
+
+        # Publish to the cache before dropping the in-flight entry so no caller misses both
+        self.set(key, value)
+        with self._lock:
+            del self._inflight[key]
+        future.set_result(value)
+        return value
+
+    def invalidate(self, *prefix: Hashable) -> int:
+        """Drop every tuple key starting with prefix (everything if no prefix is given)"""
+        with self._lock:
+            if not prefix:
+                count = len(self._data)
+                self._data.clear()
+                return count
+            stale = [key for key in self._data
+                     if isinstance(key, tuple) and key[:len(prefix)] == prefix]
+            for key in stale:
+                del self._data[key]
+            return len(stale)
+
+
+# Keys are (connection_id, kind, *scope) so a whole connection can be invalidated at once
+metadata_cache = TTLCache(maxsize=METADATA_CACHE_SIZE, ttl=METADATA_CACHE_TTL)
+
+# Keys are (kind, content_key), e.g. ("intent", normalized_query) or ("nl2sql", digest)
+llm_cache = TTLCache(maxsize=LLM_CACHE_SIZE, ttl=LLM_CACHE_TTL)
+
+# Keys are (connection_id, kind, content_key) so results never cross connections
+result_cache = TTLCache(maxsize=RESULT_CACHE_SIZE, ttl=RESULT_CACHE_TTL)
+
+# Keys are (connection_id, full_table_name); values are the formatted sample text
+sample_cache = TTLCache(maxsize=SAMPLE_CACHE_SIZE, ttl=SAMPLE_CACHE_TTL)
+
+# Keys are (dictionary_hash, full_table_name); values are the prompt text before the sample rows
+prompt_cache = TTLCache(maxsize=PROMPT_CACHE_SIZE, ttl=PROMPT_CACHE_TTL)
+
+# Keys are validation IDs; values are futures resolving to (is_valid, error)
+validation_cache = TTLCache(maxsize=VALIDATION_CACHE_SIZE, ttl=VALIDATION_CACHE_TTL)
+
+
+def invalidate_connection_caches(connection_id: str) -> int:
+    """Drop every cached metadata, sample and result entry for a connection"""
+    return (metadata_cache.invalidate(connection_id) + sample_cache.invalidate(connection_id)
+            + result_cache.invalidate(connection_id))
@@ -9,7 +9,8 @@ sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../.
 from src.core.connection_utils import (
     create_snowflake_connection, 
     get_connection, 
-    get_snowflake_connection,
+    close_connection_data,
+    ping_connection,
     remove_connection
 )
 
@@ -47,11 +48,7 @@ def check_connection_status(connection_id: str):
         }
     
     try:
-        conn = connection_data["connection"]
-        cursor = conn.cursor()
-        cursor.execute("SELECT 1")
-        cursor.fetchone()
-        cursor.close()
+        ping_connection(connection_data)
         
         return {
             "status": "connected",
@@ -61,6 +58,7 @@ def check_connection_status(connection_id: str):
         }
     except Exception as e:
         # Clean up dead connection
+        close_connection_data(connection_data)
         remove_connection(connection_id)
         return {
             "status": "error",
@@ -78,8 +76,7 @@ def disconnect(connection_id: str):
         }
     
     try:
-        conn = connection_data["connection"]
-        conn.close()
+        close_connection_data(connection_data)
         remove_connection(connection_id)
         
         return {
@@ -4,176 +4,366 @@ Dictionary functions - Core logic extracted from dictionary_router.py
 
 import sys
 import os
-import yaml
+import logging
+import uuid
+from concurrent.futures import ThreadPoolExecutor, wait
 from pathlib import Path as PathlibPath
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Tuple
 import pandas as pd
 
 # Add the project root to the path for imports
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
 from utils import llm_util
 
-from src.core.connection_utils import get_snowflake_connection, get_connection
+from src.core.connection_utils import db_executor, pooled_connection, qualify_table_name, require_connection
+from src.core.result_utils import fetch_dataframe
+from src.core.sql_utils import split_identifier, validate_identifier, quote_identifier
+from src.core.ttl_cache import validation_cache
+
+logger = logging.getLogger(__name__)
+
+# Protobuf validation is CPU work off the request path; a couple of threads is plenty
+VALIDATION_MAX_WORKERS = 2
+_validation_executor = ThreadPoolExecutor(max_workers=VALIDATION_MAX_WORKERS,
+                                          thread_name_prefix="dictionary-validation")
+
+
+def _sample_table(connection_id: str, full_table_name: str):
+    """Get sample rows for one table on a pooled connection"""
+    validate_identifier(full_table_name)
+    
+    with pooled_connection(connection_id) as conn:
+        cursor = conn.cursor()
+        try:
+            # Get sample data as a DataFrame straight from the cursor
+            logger.debug("Getting sample data from %s", full_table_name)
+            # IDENTIFIER(%s) passes the name as an escaped string literal rather than SQL text;
+            # pyformat binds client-side, so this guards injection but does not fix the statement text
+            cursor.execute("SELECT * FROM IDENTIFIER(%s) LIMIT 10", (full_table_name,))
+            sample_df = fetch_dataframe(cursor)
+            logger.debug("Got %s sample rows", len(sample_df))
+        finally:
+            cursor.close()
+    
+    return sample_df
+
+
+def _column_type(data_type: str, char_length, precision, scale) -> str:
+    """Rebuild a DESCRIBE-style type such as VARCHAR(16) or NUMBER(38,0) from INFORMATION_SCHEMA"""
+    if data_type == "TEXT" and char_length is not None:
+        return f"VARCHAR({char_length})"
+    if data_type == "NUMBER" and precision is not None:
+        return f"NUMBER({precision},{scale or 0})"
+    return data_type
+
+
+def _load_columns(connection_id: str, database: str, tables: List[Tuple[str, str]]):
+    """Get (name, type, nullable) columns for several tables of one database in a single query"""
+    # INFORMATION_SCHEMA is served by cloud services, so this needs no warehouse and
+    # replaces one DESCRIBE per table
+    conditions = " OR ".join(["(table_schema = %s AND table_name = %s)"] * len(tables))
+    params = [name for schema_and_table in tables for name in schema_and_table]
+    columns_sql = f"""
+    SELECT table_schema, table_name, column_name, data_type, is_nullable,
+           character_maximum_length, numeric_precision, numeric_scale
+    FROM {quote_identifier(database)}.INFORMATION_SCHEMA.COLUMNS
+    WHERE {conditions}
+    ORDER BY table_schema, table_name, ordinal_position
+    """
+    
+    logger.debug("Getting columns for %s tables in %s", len(tables), database)
+    with pooled_connection(connection_id) as conn:
+        cursor = conn.cursor()
+        cursor.execute(columns_sql, params)
+        rows = cursor.fetchall()
+        cursor.close()
+    
+    columns = {}
+    for row in rows:
+        columns.setdefault((row[0], row[1]), []).append(
+            (row[2], _column_type(row[3], row[5], row[6], row[7]), row[4] == "YES")
+        )
+    return columns
+
+
+def _describe_columns(connection_id: str, full_table_name: str):
+    """Get (name, type, nullable) columns from DESCRIBE TABLE, for names without a database"""
+    validate_identifier(full_table_name)
+    
+    with pooled_connection(connection_id) as conn:
+        cursor = conn.cursor()
+        logger.debug("Getting schema for %s", full_table_name)
+        cursor.execute("DESCRIBE TABLE IDENTIFIER(%s)", (full_table_name,))
+        schema_info = cursor.fetchall()
+        cursor.close()
+    
+    logger.debug("Found %s columns", len(schema_info))
+    return [(row[0], row[1], row[2] == "Y") for row in schema_info]
+
+
+def _native_sample_values(sample_df: pd.DataFrame) -> pd.DataFrame:
+    """Numbers as Python int/float, everything else as str, and missing values as None"""
+    converted = {}
+    for col_name in sample_df.columns:
+        series = sample_df[col_name]
+        # astype(object) boxes a whole numeric column into Python scalars in one pass
+        if pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series):
+            values = series.astype(object)
+        else:
+            values = series.astype(str)
+        converted[col_name] = values.where(series.notna(), None)
+    return pd.DataFrame(converted, columns=sample_df.columns, dtype=object)
+
+
+def _is_numeric_type(col_type: str) -> bool:
+    """Whether a column type gets numeric (min/max/avg) statistics"""
+    return 'NUMBER' in col_type.upper() or 'FLOAT' in col_type.upper()
+
+
+def _table_stats(connection_id: str, full_table_name: str, schema_info):
+    """Get the row count and every column's statistics from one aggregate query over the table"""
+    # One scan and one round-trip instead of COUNT(*) plus a query per column. Distinct
+    # counts use HyperLogLog, which is far cheaper than exact COUNT(DISTINCT) on wide tables
+    select_list = ["COUNT(*)"]
+    for col_info in schema_info:
+        # The table is a bind parameter, so a literal % in a column name must be doubled
+        quoted_col = quote_identifier(col_info[0]).replace("%", "%%")
+        if _is_numeric_type(col_info[1]):
+            select_list += [f"MIN({quoted_col})", f"MAX({quoted_col})", f"AVG({quoted_col})",
+                            f"APPROX_COUNT_DISTINCT({quoted_col})"]
+        else:
+            select_list += [f"APPROX_COUNT_DISTINCT({quoted_col})", f"COUNT({quoted_col})"]
+    
+    try:
+        logger.debug("Getting statistics for %s", full_table_name)
+        with pooled_connection(connection_id) as conn:
+            cursor = conn.cursor()
+            cursor.execute(f"SELECT {', '.join(select_list)} FROM IDENTIFIER(%s)", (full_table_name,))
+            values = cursor.fetchone()
+            cursor.close()
+    except Exception as stats_error:
+        # A single column type the aggregates reject should not lose every column's statistics
+        logger.debug("Combined statistics failed for %s, querying per column: %s", full_table_name, stats_error)
+        with pooled_connection(connection_id) as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT COUNT(*) as row_count FROM IDENTIFIER(%s)", (full_table_name,))
+            row_count_result = cursor.fetchone()
+            cursor.close()
+        row_count = int(row_count_result[0]) if row_count_result else 0
+        return row_count, [_column_stats(connection_id, full_table_name, col_info[0], col_info[1])
+                           for col_info in schema_info]
+    
+    row_count = int(values[0]) if values[0] is not None else 0
+    logger.debug("Row count: %s", row_count)
+    
+    # Values come back in select_list order
+    position = 1
+    all_stats = []
+    for col_info in schema_info:
+        if _is_numeric_type(col_info[1]):
+            min_val, max_val, avg_val, distinct_count = values[position:position + 4]
+            position += 4
+            col_stats = {
+                "min_val": float(min_val) if min_val is not None else None,
+                "max_val": float(max_val) if max_val is not None else None,
+                "avg_val": float(avg_val) if avg_val is not None else None,
+                "distinct_count": int(distinct_count) if distinct_count is not None else None
+            }
+        else:
+            distinct_count, non_null_count = values[position:position + 2]
+            position += 2
+            col_stats = {
+                "distinct_count": int(distinct_count) if distinct_count is not None else None,
+                "non_null_count": int(non_null_count) if non_null_count is not None else None
+            }
+        all_stats.append(col_stats)
+    
+    return row_count, all_stats
+
+
+def _column_stats(connection_id: str, full_table_name: str, col_name: str, col_type: str):
+    """Get statistics for one column on a pooled connection, or {} if the query fails"""
+    # The table is a bind parameter, so a literal % in a column name must be doubled
+    quoted_col = quote_identifier(col_name).replace("%", "%%")
+    
+    # Get column statistics if it's numeric
+    if _is_numeric_type(col_type):
+        try:
+            logger.debug("Getting numeric stats for column %s", col_name)
+            col_stats_sql = f"""
+            SELECT 
+                MIN({quoted_col}) as min_val,
+                MAX({quoted_col}) as max_val,
+                AVG({quoted_col}) as avg_val,
+                APPROX_COUNT_DISTINCT({quoted_col}) as distinct_count
+            FROM IDENTIFIER(%s)
+            """
+            with pooled_connection(connection_id) as conn:
+                cursor = conn.cursor()
+                cursor.execute(col_stats_sql, (full_table_name,))
+                col_stats_result = cursor.fetchone()
+                cursor.close()
+            col_stats = {
+                "min_val": float(col_stats_result[0]) if col_stats_result[0] is not None else None,
+                "max_val": float(col_stats_result[1]) if col_stats_result[1] is not None else None,
+                "avg_val": float(col_stats_result[2]) if col_stats_result[2] is not None else None,
+                "distinct_count": int(col_stats_result[3]) if col_stats_result[3] is not None else None
+            }
+            logger.debug("Numeric stats for %s: %s", col_name, col_stats)
+        except Exception as col_error:
+            logger.debug("Error getting numeric stats for %s: %s", col_name, col_error)
+            col_stats = {}
+    else:
+        # For string columns, get distinct count and sample values
+        try:
+            logger.debug("Getting string stats for column %s", col_name)
+            col_stats_sql = f"""
+            SELECT 
+                APPROX_COUNT_DISTINCT({quoted_col}) as distinct_count,
+                COUNT({quoted_col}) as non_null_count
+            FROM IDENTIFIER(%s)
+            """
+            with pooled_connection(connection_id) as conn:
+                cursor = conn.cursor()
+                cursor.execute(col_stats_sql, (full_table_name,))
+                col_stats_result = cursor.fetchone()
+                cursor.close()
+            col_stats = {
+                "distinct_count": int(col_stats_result[0]) if col_stats_result[0] is not None else None,
+                "non_null_count": int(col_stats_result[1]) if col_stats_result[1] is not None else None
+            }
+            logger.debug("String stats for %s: %s", col_name, col_stats)
+        except Exception as col_error:
+            logger.debug("Error getting string stats for %s: %s", col_name, col_error)
+            col_stats = {}
+    
+    return col_stats
 
 
 def analyze_tables(connection_id: str, tables: List[str]):
     """Analyze selected tables and generate sample data for data dictionary creation"""
     try:
-        conn = get_snowflake_connection(connection_id)
-        conn_details = get_connection(connection_id)
-        database = conn_details.get("database", "")
-        schema = conn_details.get("schema", "")
+        conn_details = require_connection(connection_id)
+        
+        # Construct full table names if needed
+        full_table_names = {table_name: qualify_table_name(conn_details, table_name) for table_name in tables}
+        
+        # Fully qualified tables get their columns from INFORMATION_SCHEMA, batched per database
+        catalog_names = {}
+        tables_by_database = {}
+        for table_name, full_table_name in full_table_names.items():
+            try:
+                parts = split_identifier(full_table_name)
+            except ValueError:
+                continue  # Reported by the sample query's validation below
+            if len(parts) == 3:
+                catalog_names[table_name] = tuple(parts)
+                tables_by_database.setdefault(parts[0], set()).add((parts[1], parts[2]))
         
         table_analysis = {}
         
-        for table_name in tables:
-            print(f"DEBUG: Analyzing table {table_name}")
-            
-            # Construct full table name if needed
-            if "." not in table_name and database and schema:
-                full_table_name = f"{database}.{schema}.{table_name}"
-            else:
-                full_table_name = table_name
-            
+        # Every statement checks out its own pooled session, so wall clock is bounded by
+        # the slowest queries rather than the sum of tables x columns
+        # Look up columns and sample all tables concurrently
+        sample_futures = {
+            table_name: db_executor.submit(_sample_table, connection_id, full_table_name)
+            for table_name, full_table_name in full_table_names.items()
+        }
+        column_futures = {
+            database: db_executor.submit(_load_columns, connection_id, database, sorted(database_tables))
+            for database, database_tables in tables_by_database.items()
+        }
+        describe_futures = {
+            table_name: db_executor.submit(_describe_columns, connection_id, full_table_name)
+            for table_name, full_table_name in full_table_names.items()
+            if table_name not in catalog_names
+        }
+        
+        # Then run each table's combined statistics query concurrently
+        described = {}
+        table_errors = {}
+        stats_futures = {}
+        for table_name in full_table_names:
+            logger.debug("Analyzing table %s", table_name)
             try:
-                # Get table schema information
-                cursor = conn.cursor()
-                print(f"DEBUG: Getting schema for {full_table_name}")
-                cursor.execute(f"DESCRIBE TABLE {full_table_name}")
-                schema_info = cursor.fetchall()
-                print(f"DEBUG: Found {len(schema_info)} columns")
-                
-                # Get sample data - use cursor instead of pandas to avoid SQLAlchemy warning
-                print(f"DEBUG: Getting sample data from {full_table_name}")
-                sample_sql = f"SELECT * FROM {full_table_name} LIMIT 10"
-                cursor.execute(sample_sql)
-                sample_rows = cursor.fetchall()
-                sample_columns = [desc[0] for desc in cursor.description]
-                print(f"DEBUG: Got {len(sample_rows)} sample rows")
-                
-                # Convert to DataFrame for easier processing
-                sample_df = pd.DataFrame(sample_rows, columns=sample_columns)
-                
-                # Get table statistics
-                print(f"DEBUG: Getting row count for {full_table_name}")
-                stats_sql = f"SELECT COUNT(*) as row_count FROM {full_table_name}"
-                cursor.execute(stats_sql)
-                row_count_result = cursor.fetchone()
-                row_count = int(row_count_result[0]) if row_count_result else 0
-                print(f"DEBUG: Row count: {row_count}")
-                
-                # Analyze each column
-                columns_info = []
-                for col_info in schema_info:
-                    col_name = col_info[0]
-                    col_type = col_info[1]
-                    col_nullable = col_info[2]
-                    
-                    # Get column statistics if it's numeric
-                    if 'NUMBER' in col_type.upper() or 'FLOAT' in col_type.upper():
-                        try:
-                            print(f"DEBUG: Getting numeric stats for column {col_name}")
-                            col_stats_sql = f"""
-                            SELECT 
-                                MIN({col_name}) as min_val,
-                                MAX({col_name}) as max_val,
-                                AVG({col_name}) as avg_val,
-                                COUNT(DISTINCT {col_name}) as distinct_count
-                            FROM {full_table_name}
-                            """
-                            cursor.execute(col_stats_sql)
-                            col_stats_result = cursor.fetchone()
-                            col_stats = {
-                                "min_val": float(col_stats_result[0]) if col_stats_result[0] is not None else None,
-                                "max_val": float(col_stats_result[1]) if col_stats_result[1] is not None else None,
-                                "avg_val": float(col_stats_result[2]) if col_stats_result[2] is not None else None,
-                                "distinct_count": int(col_stats_result[3]) if col_stats_result[3] is not None else None
-                            }
-                            print(f"DEBUG: Numeric stats for {col_name}: {col_stats}")
-                        except Exception as col_error:
-                            print(f"DEBUG: Error getting numeric stats for {col_name}: {col_error}")
-                            col_stats = {}
-                    else:
-                        # For string columns, get distinct count and sample values
-                        try:
-                            print(f"DEBUG: Getting string stats for column {col_name}")
-                            col_stats_sql = f"""
-                            SELECT 
-                                COUNT(DISTINCT {col_name}) as distinct_count,
-                                COUNT({col_name}) as non_null_count
-                            FROM {full_table_name}
-                            """
-                            cursor.execute(col_stats_sql)
-                            col_stats_result = cursor.fetchone()
-                            col_stats = {
-                                "distinct_count": int(col_stats_result[0]) if col_stats_result[0] is not None else None,
-                                "non_null_count": int(col_stats_result[1]) if col_stats_result[1] is not None else None
-                            }
-                            print(f"DEBUG: String stats for {col_name}: {col_stats}")
-                        except Exception as col_error:
-                            print(f"DEBUG: Error getting string stats for {col_name}: {col_error}")
-                            col_stats = {}
-                    
-                    # Get sample values and convert numpy types
-                    if col_name in sample_df.columns:
-                        sample_values_raw = sample_df[col_name].head(5).tolist()
-                        sample_values = [
-                            float(v) if pd.notna(v) and str(type(v)).startswith('<class \'numpy.float') else
-                            int(v) if pd.notna(v) and str(type(v)).startswith('<class \'numpy.int') else
-                            str(v) if pd.notna(v) else None
-                            for v in sample_values_raw
-                        ]
-                    else:
-                        sample_values = []
-                    
-                    columns_info.append({
-                        "name": col_name,
-                        "type": col_type,
-                        "nullable": col_nullable == "Y",
-                        "statistics": col_stats,
-                        "sample_values": sample_values
-                    })
-                
-                cursor.close()
-                
-                # Convert sample data and handle numpy types
-                sample_data_raw = sample_df.head(5).to_dict(orient="records")
-                sample_data = []
-                for record in sample_data_raw:
-                    converted_record = {}
-                    for k, v in record.items():
-                        if pd.notna(v):
-                            if str(type(v)).startswith('<class \'numpy.float'):
-                                converted_record[k] = float(v)
-                            elif str(type(v)).startswith('<class \'numpy.int'):
-                                converted_record[k] = int(v)
-                            else:
-                                converted_record[k] = str(v)
-                        else:
-                            converted_record[k] = None
-                    sample_data.append(converted_record)
-                
+                sample_df = sample_futures[table_name].result()
+                if table_name in catalog_names:
+                    database, schema, table = catalog_names[table_name]
+                    schema_info = column_futures[database].result().get((schema, table))
+                    if not schema_info:
+                        raise Exception(f"Table '{full_table_names[table_name]}' does not exist or not authorized.")
+                else:
+                    schema_info = describe_futures[table_name].result()
+            except Exception as table_error:
+                logger.debug("Error analyzing table %s: %s", table_name, table_error)
+                table_errors[table_name] = str(table_error)
+                continue
+            
+            described[table_name] = (schema_info, sample_df)
+            stats_futures[table_name] = db_executor.submit(
+                _table_stats, connection_id, full_table_names[table_name], schema_info
+            )
+        
+        for table_name in tables:
+            full_table_name = full_table_names[table_name]
+            if table_name in table_errors:
                 table_analysis[table_name] = {
-                    "full_name": full_table_name,
-                    "row_count": row_count,
-                    "columns": columns_info,
-                    "sample_data": sample_data
+                    "error": table_errors[table_name],
+                    "full_name": full_table_name
                 }
-                
-                print(f"DEBUG: Successfully analyzed table {table_name} with {len(columns_info)} columns")
-                
+                continue
+            
+            schema_info, sample_df = described[table_name]
+            try:
+                row_count, all_stats = stats_futures[table_name].result()
             except Exception as table_error:
-                print(f"DEBUG: Error analyzing table {table_name}: {table_error}")
+                logger.debug("Error analyzing table %s: %s", table_name, table_error)
                 table_analysis[table_name] = {
                     "error": str(table_error),
                     "full_name": full_table_name
                 }
+                continue
+            
+            # Convert the sample rows to native Python values once, column by column
+            sample_values_df = _native_sample_values(sample_df.head(5))
+            
+            # Analyze each column, keeping DESCRIBE order
+            columns_info = []
+            for col_info, col_stats in zip(schema_info, all_stats):
+                col_name = col_info[0]
+                col_type = col_info[1]
+                col_nullable = col_info[2]
+                
+                # Get sample values
+                if col_name in sample_values_df.columns:
+                    sample_values = sample_values_df[col_name].tolist()
+                else:
+                    sample_values = []
+                
+                columns_info.append({
+                    "name": col_name,
+                    "type": col_type,
+                    "nullable": col_nullable,
+                    "statistics": col_stats,
+                    "sample_values": sample_values
+                })
+            
+            sample_data = sample_values_df.to_dict(orient="records")
+            
+            table_analysis[table_name] = {
+                "full_name": full_table_name,
+                "row_count": row_count,
+                "columns": columns_info,
+                "sample_data": sample_data
+            }
+            
+            logger.debug("Successfully analyzed table %s with %s columns", table_name, len(columns_info))
         
         return {
             "status": "success",
             "connection_id": connection_id,
-            "database": database,
-            "schema": schema,
+            "database": conn_details.get("database", ""),
+            "schema": conn_details.get("schema", ""),
             "tables_analyzed": len(tables),
             "analysis": table_analysis
         }
@@ -185,7 +375,16 @@ def analyze_tables(connection_id: str, tables: List[str]):
         }
 
 
-def generate_data_dictionary(connection_id: str, tables: List[str], database_name: str, schema_name: str):
+def _validate_dictionary(parsed_yaml: Dict[str, Any]) -> Tuple[bool, Any]:
+    """Validate a generated dictionary against the protobuf schema, logging failures"""
+    is_valid, error = llm_util.validate_yaml_with_proto(parsed_yaml)
+    if not is_valid:
+        logger.warning("Generated YAML failed protobuf validation: %s", error)
+    return is_valid, error
+
+
+def generate_data_dictionary(connection_id: str, tables: List[str], database_name: str, schema_name: str,
+                             include_parsed: bool = False):
     """Generate YAML data dictionary from analyzed table data using LLM"""
     try:
         # First analyze the tables
@@ -207,14 +406,14 @@ def generate_data_dictionary(connection_id: str, tables: List[str], database_nam
             if "error" in table_info:
                 continue
             
-            # Create table information for the prompt
-            table_prompt_info = f"\nTable: {table_name}\n"
-            table_prompt_info += f"Full Name: {table_info.get('full_name', f'{database_name}.{schema_name}.{table_name}')}\n"
-            table_prompt_info += f"Row Count: {table_info.get('row_count', 'Unknown')}\n"
-            table_prompt_info += "Columns:\n"
+            # Create table information for the prompt, joined once rather than re-copied per column
+            table_prompt_info = [f"\nTable: {table_name}\n"]
+            table_prompt_info.append(f"Full Name: {table_info.get('full_name', f'{database_name}.{schema_name}.{table_name}')}\n")
+            table_prompt_info.append(f"Row Count: {table_info.get('row_count', 'Unknown')}\n")
+            table_prompt_info.append("Columns:\n")
             
             columns_list = table_info.get("columns", [])
-            table_prompt_info += f"Total Columns: {len(columns_list)}\n"
+            table_prompt_info.append(f"Total Columns: {len(columns_list)}\n")
             
             for i, col in enumerate(columns_list, 1):
                 col_name = col["name"]
@@ -223,22 +422,22 @@ def generate_data_dictionary(connection_id: str, tables: List[str], database_nam
                 sample_values = col.get("sample_values", [])[:5]  # First 5 sample values for better context
                 stats = col.get("statistics", {})
                 
-                table_prompt_info += f"  {i}. {col_name} ({col_type}, {nullable})"
+                table_prompt_info.append(f"  {i}. {col_name} ({col_type}, {nullable})")
                 if sample_values:
-                    table_prompt_info += f" - samples: {sample_values}"
+                    table_prompt_info.append(f" - samples: {sample_values}")
                 
                 # Add statistical context for better descriptions
                 if stats:
                     if 'distinct_count' in stats:
-                        table_prompt_info += f" - distinct values: {stats['distinct_count']}"
+                        table_prompt_info.append(f" - distinct values: {stats['distinct_count']}")
                     if 'min_val' in stats and 'max_val' in stats:
-                        table_prompt_info += f" - range: {stats['min_val']} to {stats['max_val']}"
+                        table_prompt_info.append(f" - range: {stats['min_val']} to {stats['max_val']}")
                     if 'avg_val' in stats:
-                        table_prompt_info += f" - average: {stats['avg_val']:.2f}"
+                        table_prompt_info.append(f" - average: {stats['avg_val']:.2f}")
                         
-                table_prompt_info += "\n"
+                table_prompt_info.append("\n")
             
-            all_tables_info.append(table_prompt_info)
+            all_tables_info.append("".join(table_prompt_info))
         
         if all_tables_info:
             # Create a comprehensive prompt for multiple tables
@@ -315,14 +514,14 @@ VERIFICATION CHECKLIST - Ensure your YAML includes:
 - Concise descriptions (15 words or less) for all tables and columns
 """
             
-            print(f"DEBUG: Generating YAML for {len(all_tables_info)} tables using structured output")
+            logger.debug("Generating YAML for %s tables using structured output", len(all_tables_info))
             
             # Create comprehensive prompt for structured generation
             complete_prompt = f"{system_prompt}\n\n{user_prompt}"
             
             # Generate YAML using structured output (guaranteed valid)
             yaml_text = llm_util.generate_structured_yaml(complete_prompt)
-            parsed_yaml = yaml.safe_load(yaml_text)  # Safe to parse - guaranteed valid
+            parsed_yaml = llm_util.load_yaml(yaml_text)  # Safe to parse - guaranteed valid
             
             # Verify that all columns are included in the generated YAML
             try:
@@ -355,18 +554,17 @@ VERIFICATION CHECKLIST - Ensure your YAML includes:
                     else:
                         verification_results.append(f"Table {table_name}: ❌ Table not found in YAML")
                 
-                print("DEBUG: Column verification results:")
+                logger.debug("Column verification results:")
                 for result in verification_results:
-                    print(f"  {result}")
+                    logger.debug("  %s", result)
                     
             except Exception as verify_error:
-                print(f"DEBUG: Could not verify column completeness: {verify_error}")
+                logger.debug("Could not verify column completeness: %s", verify_error)
             
-            # Validate YAML against protobuf schema
-            is_valid, error = llm_util.validate_yaml_with_proto(yaml_text)
-            if not is_valid:
-                print(f"WARNING: Generated YAML failed protobuf validation: {error}")
-                # Continue anyway, but note the warning
+            # Validate the already parsed YAML against protobuf schema in the background;
+            # the verdict is available from get_dictionary_validation(validation_id)
+            validation_id = str(uuid.uuid4())
+            validation_cache.set(validation_id, _validation_executor.submit(_validate_dictionary, parsed_yaml))
             
             return {
                 "status": "success",
@@ -375,9 +573,11 @@ VERIFICATION CHECKLIST - Ensure your YAML includes:
                 "schema": schema_name,
                 "tables": tables,
                 "yaml_dictionary": yaml_text,
-                "parsed_dictionary": parsed_yaml,
-                "validation_status": "valid" if is_valid else "invalid",
-                "validation_error": error if not is_valid else None,
+                # The raw YAML is what callers use; the parsed form only doubles the payload
+                "parsed_dictionary": parsed_yaml if include_parsed else None,
+                "validation_id": validation_id,
+                "validation_status": "pending",
+                "validation_error": None,
                 "tables_processed": len([t for t in table_analysis.values() if "error" not in t])
             }
             
@@ -388,8 +588,38 @@ VERIFICATION CHECKLIST - Ensure your YAML includes:
             }
         
     except Exception as e:
-        print(f"DEBUG: Error generating data dictionary: {e}")
+        logger.debug("Error generating data dictionary: %s", e)
         return {
             "status": "error",
             "error": f"Error generating data dictionary: {str(e)}"
-        }
\ No newline at end of file
+        }
+
+
+def get_dictionary_validation(validation_id: str, timeout: Optional[float] = None):
+    """Get the result of a background dictionary validation started by generate_data_dictionary,
+    waiting up to timeout seconds for it to finish"""
+    future = validation_cache.get(validation_id)
+    if future is None:
+        return {
+            "status": "error",
+            "error": "Validation not found"
+        }
+    
+    if timeout:
+        wait([future], timeout=timeout)
+    
+    if not future.done():
+        return {
+            "status": "success",
+            "validation_id": validation_id,
+            "validation_status": "pending",
+            "validation_error": None
+        }
+    
+    is_valid, error = future.result()
+    return {
+        "status": "success",
+        "validation_id": validation_id,
+        "validation_status": "valid" if is_valid else "invalid",
+        "validation_error": error if not is_valid else None
+    }
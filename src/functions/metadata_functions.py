@@ -4,19 +4,157 @@ Metadata functions - Core logic extracted from metadata_router.py
 
 import sys
 import os
+from typing import List, Optional
+from snowflake.connector import DictCursor
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
 
-from src.core.connection_utils import get_snowflake_connection
+from src.core.connection_utils import invalidate_shared_caches, pooled_connection
+from src.core.sql_utils import split_identifier, validate_identifier, validate_stage_name
+from src.core.ttl_cache import metadata_cache
+
+# Snowflake returns at most this many rows from a single SHOW statement
+SHOW_PAGE_SIZE = 10000
+
+
+def _table_info(row):
+    """Map a SHOW TABLES row (from a DictCursor) to a table info dict"""
+    return {
+        "database": row["database_name"],
+        "schema": row["schema_name"],
+        "table": row["name"],
+        "table_type": row["kind"]
+    }
+
+
+def _fetch_show_rows(cursor, show_sql: str, limit: Optional[int] = None, after: Optional[str] = None):
+    """Run a SHOW statement for one page (limit given) or page through every row (limit None)"""
+    def page_sql(page_size, start_after):
+        sql = f"{show_sql} LIMIT {int(page_size)}"
+        if start_after:
+            sql += " FROM '" + start_after.replace("'", "''") + "'"
+        return sql
+    
+    if limit:
+        cursor.execute(page_sql(limit, after))
+        return cursor.fetchall()
+    
+    rows = []
+    while True:
+        cursor.execute(page_sql(SHOW_PAGE_SIZE, after))
+        page = cursor.fetchall()
+        rows.extend(page)
+        if len(page) < SHOW_PAGE_SIZE:
+            return rows
+        after = page[-1]["name"]
+
+
+def _next_cursor(names: List[str], limit: Optional[int]):
+    """Name to pass as `after` for the next page, or None when this was the last page"""
+    return names[-1] if limit and len(names) == limit else None
+
+
+def _load_databases(connection_id: str):
+    """Run SHOW DATABASES on a pooled connection"""
+    with pooled_connection(connection_id) as conn:
+        cursor = conn.cursor(DictCursor)
+        cursor.execute("SHOW DATABASES")
+        databases = [row["name"] for row in cursor.fetchall()]
+        cursor.close()
+    return databases
+
+
+def _load_schemas(connection_id: str, database: str, limit: Optional[int], after: Optional[str]):
+    """Run SHOW TERSE SCHEMAS on a pooled connection"""
+    with pooled_connection(connection_id) as conn:
+        cursor = conn.cursor(DictCursor)
+        show_sql = f"SHOW TERSE SCHEMAS IN DATABASE {validate_identifier(database)}"
+        schemas = [row["name"] for row in _fetch_show_rows(cursor, show_sql, limit, after)]
+        cursor.close()
+    return schemas
+
+
+def _load_tables(connection_id: str, database: str, schema: str, limit: Optional[int], after: Optional[str]):
+    """Run SHOW TERSE TABLES on a pooled connection"""
+    with pooled_connection(connection_id) as conn:
+        cursor = conn.cursor(DictCursor)
+        show_sql = f"SHOW TERSE TABLES IN SCHEMA {validate_identifier(database)}.{validate_identifier(schema)}"
+        tables = [_table_info(row) for row in _fetch_show_rows(cursor, show_sql, limit, after)]
+        cursor.close()
+    return tables
+
+
+def _load_stages(connection_id: str, database: str, schema: str):
+    """Run SHOW STAGES on a pooled connection"""
+    with pooled_connection(connection_id) as conn:
+        cursor = conn.cursor(DictCursor)
+        cursor.execute(f"SHOW STAGES IN SCHEMA {validate_identifier(database)}.{validate_identifier(schema)}")
+        
+        stages = []
+        for row in cursor.fetchall():
+            stages.append({
+                "name": row["name"],
+                "database": row["database_name"],
+                "schema": row["schema_name"],
+                "type": row["type"]
+            })
+        cursor.close()
+    return stages
+
+
+def _load_stage_files(connection_id: str, stage_name: str, pattern: Optional[str], limit: Optional[int]):
+    """Run LIST on a stage on a pooled connection"""
+    with pooled_connection(connection_id) as conn:
+        cursor = conn.cursor(DictCursor)
+
+        list_sql = f"LIST {validate_stage_name(stage_name)}"
+        if pattern:
+            # PATTERN is a regex inside a string literal, so escape backslashes and quotes
+            escaped_pattern = pattern.replace("\\", "\\\\").replace("'", "\\'")
+            list_sql += f" PATTERN = '{escaped_pattern}'"
+        cursor.execute(list_sql)
+
+        # Only materialize as many rows as the caller asked for
+        rows = cursor.fetchmany(limit) if limit else cursor.fetchall()
+
+        files = []
+        for row in rows:
+            files.append({
+                "name": row["name"],
+                "size": int(row["size"]),
+                "last_modified": str(row["last_modified"])
+            })
+        cursor.close()
+    return files
+
+
+def _load_database_tables(connection_id: str, database: str):
+    """Run SHOW TABLES for a whole database on a pooled connection"""
+    with pooled_connection(connection_id) as conn:
+        cursor = conn.cursor(DictCursor)
+        try:
+            # Paged, since a single SHOW stops at SHOW_PAGE_SIZE rows without saying so
+            show_sql = f"SHOW TABLES IN DATABASE {validate_identifier(database)}"
+            return [_table_info(row) for row in _fetch_show_rows(cursor, show_sql)]
+        finally:
+            cursor.close()
+
+
+def _show_tables_in_database(connection_id: str, database: str):
+    """Cached, single-flight SHOW TABLES for a whole database"""
+    return metadata_cache.get_or_load(
+        (connection_id, "database_tables", database),
+        lambda: _load_database_tables(connection_id, database)
+    )
 
 
 def list_databases(connection_id: str):
     """List all databases"""
     try:
-        conn = get_snowflake_connection(connection_id)
-        cursor = conn.cursor()
-        cursor.execute("SHOW DATABASES")
-        databases = [row[1] for row in cursor.fetchall()]  # Database name is in column 1
-        cursor.close()
+        # Concurrent callers for the same key share one SHOW instead of each issuing their own
+        databases = metadata_cache.get_or_load(
+            (connection_id, "databases"),
+            lambda: _load_databases(connection_id)
+        )
         
         return {
             "status": "success",
@@ -29,18 +167,18 @@ def list_databases(connection_id: str):
         }
 
 
-def list_schemas(connection_id: str, database: str):
-    """List schemas in a database"""
+def list_schemas(connection_id: str, database: str, limit: Optional[int] = None, after: Optional[str] = None):
+    """List schemas in a database, one page at a time when limit is given"""
     try:
-        conn = get_snowflake_connection(connection_id)
-        cursor = conn.cursor()
-        cursor.execute(f"SHOW SCHEMAS IN DATABASE {database}")
-        schemas = [row[1] for row in cursor.fetchall()]  # Schema name is in column 1
-        cursor.close()
+        schemas = metadata_cache.get_or_load(
+            (connection_id, "schemas", database, limit, after),
+            lambda: _load_schemas(connection_id, database, limit, after)
+        )
         
         return {
             "status": "success",
-            "schemas": schemas
+            "schemas": schemas,
+            "next_cursor": _next_cursor(schemas, limit)
         }
     except Exception as e:
         return {
@@ -49,26 +187,29 @@ def list_schemas(connection_id: str, database: str):
         }
 
 
-def list_tables(connection_id: str, database: str, schema: str):
-    """List tables in a schema"""
+def list_tables(connection_id: str, database: str, schema: str, limit: Optional[int] = None, after: Optional[str] = None):
+    """List tables in a schema, one page at a time when limit is given"""
     try:
-        conn = get_snowflake_connection(connection_id)
-        cursor = conn.cursor()
-        cursor.execute(f"SHOW TABLES IN SCHEMA {database}.{schema}")
-        
-        tables = []
-        for row in cursor.fetchall():
-            tables.append({
-                "database": row[2],  # Database name
-                "schema": row[3],    # Schema name
-                "table": row[1],     # Table name
-                "table_type": row[4] # Table type
-            })
-        cursor.close()
+        database_tables = metadata_cache.get((connection_id, "database_tables", database))
+        if database_tables is not None:
+            # A warm whole-database listing answers any schema without another SHOW; SHOW
+            # reports stored names, so resolve the requested one the way Snowflake does
+            schema_name = split_identifier(schema)[-1]
+            tables = [t for t in database_tables if t["schema"] == schema_name]
+            if after:
+                tables = [t for t in tables if t["table"] > after]
+            if limit:
+                tables = tables[:limit]
+        else:
+            tables = metadata_cache.get_or_load(
+                (connection_id, "tables", database, schema, limit, after),
+                lambda: _load_tables(connection_id, database, schema, limit, after)
+            )
         
         return {
             "status": "success",
-            "tables": tables
+            "tables": tables,
+            "next_cursor": _next_cursor([t["table"] for t in tables], limit)
         }
     except Exception as e:
         return {
@@ -80,19 +221,10 @@ def list_tables(connection_id: str, database: str, schema: str):
 def list_stages(connection_id: str, database: str, schema: str):
     """List stages in a schema"""
     try:
-        conn = get_snowflake_connection(connection_id)
-        cursor = conn.cursor()
-        cursor.execute(f"SHOW STAGES IN SCHEMA {database}.{schema}")
-        
-        stages = []
-        for row in cursor.fetchall():
-            stages.append({
-                "name": row[1],      # Stage name
-                "database": row[2],  # Database name
-                "schema": row[3],    # Schema name
-                "type": row[4]       # Stage type
-            })
-        cursor.close()
+        stages = metadata_cache.get_or_load(
+            (connection_id, "stages", database, schema),
+            lambda: _load_stages(connection_id, database, schema)
+        )
         
         return {
             "status": "success",
@@ -105,21 +237,14 @@ def list_stages(connection_id: str, database: str, schema: str):
         }
 
 
-def list_stage_files(connection_id: str, stage_name: str):
-    """List files in a stage"""
+def list_stage_files(connection_id: str, stage_name: str, pattern: Optional[str] = None, limit: Optional[int] = None):
+    """List files in a stage, optionally filtered server-side by a regex pattern"""
     try:
-        conn = get_snowflake_connection(connection_id)
-        cursor = conn.cursor()
-        cursor.execute(f"LIST {stage_name}")
-        
-        files = []
-        for row in cursor.fetchall():
-            files.append({
-                "name": row[0],                    # File name
-                "size": int(row[1]),              # File size
-                "last_modified": str(row[2])      # Last modified timestamp
-            })
-        cursor.close()
+        # Saving a dictionary to a stage invalidates these entries
+        files = metadata_cache.get_or_load(
+            (connection_id, "stage_files", stage_name, pattern, limit),
+            lambda: _load_stage_files(connection_id, stage_name, pattern, limit)
+        )
         
         return {
             "status": "success",
@@ -129,4 +254,13 @@ def list_stage_files(connection_id: str, stage_name: str):
         return {
             "status": "error",
             "error": f"Error listing stage files: {str(e)}"
-        }
\ No newline at end of file
+        }
+
+
+def invalidate_metadata_cache(connection_id: str):
+    """Drop cached SHOW results, samples and NL2SQL answers for a connection so the next call hits Snowflake"""
+    removed = invalidate_shared_caches(connection_id)
+    return {
+        "status": "success",
+        "message": f"Cleared {removed} cached metadata entries"
+    }
@@ -4,24 +4,162 @@ Query functions - Core logic extracted from query_router.py
 
 import sys
 import os
+import csv
+import io
 import re
+import hashlib
+import logging
 from pathlib import Path as PathlibPath
 from typing import Optional
 import pandas as pd
+from snowflake.connector.errors import ProgrammingError
 
 # Add the project root to the path for imports
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
 from utils import llm_util
 import config
 
-from src.core.connection_utils import get_snowflake_connection, get_connection
+from src.core.connection_utils import (
+    db_executor, get_connection, invalidate_shared_caches, pooled_connection, qualify_table_name, require_connection
+)
+from src.core.result_utils import fetch_records
+from src.core.sql_utils import ensure_limit, is_ddl, validate_identifier
+from src.core.ttl_cache import llm_cache, prompt_cache, result_cache, sample_cache
+
+logger = logging.getLogger(__name__)
+
+# The NL2SQL and intent prompts are needed on every question; read them once at import
+llm_util.preload_prompt_files(config.NL2SQL_SYSTEM_PROMPT_FILE, config.INTENT_IDENTIFIER_PROMPT_FILE)
+
+# Matches an LLM answer wrapped in a markdown code fence, capturing the SQL inside
+_FENCE_RE = re.compile(r"^\s*```(?:sql)?\s*(.*?)\s*```\s*$", re.IGNORECASE | re.DOTALL)
+
+
+def _dictionary_hash(dictionary_content: str) -> str:
+    """Content hash identifying a data dictionary in cache keys"""
+    return hashlib.sha1(dictionary_content.encode()).hexdigest()
+
+
+def _nl2sql_cache_key(query: str, full_table_name: str, dictionary_hash: str):
+    """Content-addressed cache key for SQL generated from a question, table and dictionary"""
+    raw_key = f"{llm_util.normalize_user_input(query)}|{full_table_name}|{dictionary_hash}"
+    return ("nl2sql", hashlib.blake2b(raw_key.encode(), digest_size=16).hexdigest())
+
+
+def _load_sample_data(connection_id: str, full_table_name: str) -> str:
+    """Fetch a few sample rows from a table and format them for the NL2SQL prompt"""
+    validate_identifier(full_table_name)
+    with pooled_connection(connection_id) as conn:
+        cursor = conn.cursor()
+        # IDENTIFIER(%s) passes the name as an escaped string literal rather than SQL text;
+        # pyformat binds client-side, so this guards injection but does not fix the statement text
+        try:
+            cursor.execute("SELECT * FROM IDENTIFIER(%s) SAMPLE (5 ROWS)", (full_table_name,))
+        except ProgrammingError as sample_error:
+            # Some objects (e.g. certain views) reject SAMPLE; the first rows still do for a prompt
+            logger.debug("SAMPLE failed for %s, using LIMIT: %s", full_table_name, sample_error)
+            cursor.execute("SELECT * FROM IDENTIFIER(%s) LIMIT 5", (full_table_name,))
+        columns = [desc[0] for desc in cursor.description]
+        rows = cursor.fetchmany(5)
+        cursor.close()
+    
+    # Plain CSV is all the prompt needs; no DataFrame or pandas table formatter
+    sample_buffer = io.StringIO()
+    writer = csv.writer(sample_buffer, lineterminator="\n")
+    writer.writerow(columns)
+    writer.writerows(rows)  # None is written as an empty field
+    return sample_buffer.getvalue()
+
+
+def _get_sample_data(connection_id: str, full_table_name: str) -> str:
+    """Cached sample rows for a table, so each NL question does not hit the warehouse"""
+    return sample_cache.get_or_load(
+        (connection_id, full_table_name),
+        lambda: _load_sample_data(connection_id, full_table_name)
+    )
+
+
+def _prefetch_sample_data(connection_id: str, table_name: str, dictionary_content: str):
+    """Start loading the prompt's sample rows in the background once a question needs SQL"""
+    connection_data = get_connection(connection_id)
+    if dictionary_content and connection_data:
+        # Lands in sample_cache; a later _get_sample_data waits on this load instead of repeating it
+        db_executor.submit(_get_sample_data, connection_id, qualify_table_name(connection_data, table_name))
+
+
+def _build_nl2sql_prompt(connection_id: str, full_table_name: str, dictionary_content: str,
+                         dictionary_hash: str) -> str:
+    """NL2SQL system prompt with dictionary, table and sample rows"""
+    def build_prefix():
+        # Build comprehensive prompt like create_nl2sqlchat_pompt() does
+        system_prompt = llm_util.load_prompt_file(config.NL2SQL_SYSTEM_PROMPT_FILE)
+        return f"""
+    {system_prompt}
+    ## Database Dictionary -  
+    {dictionary_content}  
+    ## Table Name
+    {full_table_name}
+    ## Sample Data
+    """
+    
+    # The dictionary-sized prefix is built once per dictionary and table; the sample rows
+    # refresh on their own TTL, so they are appended per call rather than cached with it
+    prefix = prompt_cache.get_or_load((dictionary_hash, full_table_name), build_prefix)
+    sample_data = _get_sample_data(connection_id, full_table_name)
+    return f"""{prefix}{sample_data}
+    """
+
+
+def _classify_intent(query: str) -> str:
+    """Classify a question's intent, cached per normalized question"""
+    return llm_cache.get_or_load(
+        ("intent", llm_util.normalize_user_input(query)),
+        lambda: llm_util.classify_intent(query)
+    )
+
+
+def _generate_sql(connection_id: str, query: str, table_name: str, full_table_name: str,
+                  dictionary_content: str, dictionary_hash: str) -> str:
+    """Raw LLM SQL for a question, reused for the same question, table and dictionary"""
+    sql_cache_key = _nl2sql_cache_key(query, full_table_name, dictionary_hash)
+    generated_sql = llm_cache.get(sql_cache_key)
+    if generated_sql is not None:
+        logger.debug("Using cached SQL for query")
+        return generated_sql
+    
+    # Create enriched prompt like the original NL2SQL API
+    try:
+        # Cached system prompt + dictionary prefix, followed by the current sample data
+        enriched_prompt = _build_nl2sql_prompt(
+            connection_id, full_table_name, dictionary_content, dictionary_hash
+        )
+        
+        logger.debug("Using enriched prompt with sample data")
+        
+        # Call LLM with enriched prompt
+        nl2sql_user_prompt = f"Convert the following natural language question to SQL: {query}"
+        response = llm_util.call_response_api(llm_util.llm_model, enriched_prompt, nl2sql_user_prompt)
+        generated_sql = response.choices[0].message.content
+        # Only the enriched answer is cached; the fallback below is retried on the next call
+        llm_cache.set(sql_cache_key, generated_sql)
+    
+    except Exception as sample_error:
+        logger.debug("Could not get sample data: %s", sample_error)
+        # Fallback to basic dictionary without sample data
+        generated_sql = llm_util.create_sql_from_nl(
+            query, 
+            dictionary_content, 
+            table_name
+        )
+    
+    return generated_sql
 
 
 def process_nl_query(connection_id: str, query: str, table_name: str, dictionary_content: str):
     """Process natural language query using NL2SQL and execute on Snowflake"""
     try:
-        # Step 1: Classify intent using existing LLM utility
-        intent = llm_util.classify_intent(query)
+        # Step 1: Classify intent using existing LLM utility (cached per normalized query)
+        intent = _classify_intent(query)
         
         if intent.strip() != "SQL_QUERY":
             return {
@@ -31,69 +169,34 @@ def process_nl_query(connection_id: str, query: str, table_name: str, dictionary
                 "query": query
             }
         
+        # Only SQL questions need sample rows; fetch them while the caches and prompt are checked
+        _prefetch_sample_data(connection_id, table_name, dictionary_content)
+        
         # Step 2: Generate SQL using proper NL2SQL processing like nl2sql_api.py
         if dictionary_content:
-            # Debug logging
-            print(f"DEBUG: Processing query: {query}")
-            print(f"DEBUG: Table name: {table_name}")
-            print(f"DEBUG: Dictionary length: {len(dictionary_content)} characters")
-            
-            # Get connection for sample data
-            conn = get_snowflake_connection(connection_id)
-            conn_details = get_connection(connection_id)
-            database = conn_details.get("database", "")
-            schema = conn_details.get("schema", "")
+            # Debug logging (arguments are only formatted when DEBUG is enabled)
+            logger.debug("Processing query: %s", query)
+            logger.debug("Table name: %s", table_name)
+            logger.debug("Dictionary length: %d characters", len(dictionary_content))
             
             # Construct full table name if needed
-            if "." not in table_name and database and schema:
-                full_table_name = f"{database}.{schema}.{table_name}"
-            else:
-                full_table_name = table_name
+            full_table_name = qualify_table_name(require_connection(connection_id), table_name)
             
-            # Create enriched prompt like the original NL2SQL API
-            try:
-                # Load system prompt from file (like nl2sql_api does)
-                system_prompt_file_path = config.NL2SQL_SYSTEM_PROMPT_FILE
-                system_prompt = llm_util.load_prompt_file(system_prompt_file_path)
-                
-                # Get sample data from Snowflake table (equivalent to CSV sample data)
-                sample_sql = f"SELECT * FROM {full_table_name} LIMIT 5"
-                cursor = conn.cursor()
-                cursor.execute(sample_sql)
-                sample_rows = cursor.fetchall()
-                sample_columns = [desc[0] for desc in cursor.description]
-                sample_df = pd.DataFrame(sample_rows, columns=sample_columns)
-                sample_data = sample_df.to_string(max_rows=5)
-                cursor.close()
-                
-                # Build comprehensive prompt like create_nl2sqlchat_pompt() does
-                enriched_prompt = f"""
-                {system_prompt}
-                ## Database Dictionary -  
-                {dictionary_content}  
-                ## Table Name
-                {full_table_name}
-                ## Sample Data
-                {sample_data}
-                """
-                
-                print(f"DEBUG: Using enriched prompt with sample data")
-                
-                # Call LLM with enriched prompt
-                nl2sql_user_prompt = f"Convert the following natural language question to SQL: {query}"
-                response = llm_util.call_response_api(llm_util.llm_model, enriched_prompt, nl2sql_user_prompt)
-                generated_sql = response.choices[0].message.content
-                
-            except Exception as sample_error:
-                print(f"DEBUG: Could not get sample data: {sample_error}")
-                # Fallback to basic dictionary without sample data
-                generated_sql = llm_util.create_sql_from_nl(
-                    query, 
-                    dictionary_content, 
-                    table_name
-                )
+            # Repeat questions within the result TTL skip the LLM and the warehouse entirely
+            dictionary_hash = _dictionary_hash(dictionary_content)
+            sql_cache_key = _nl2sql_cache_key(query, full_table_name, dictionary_hash)
+            result_cache_key = (connection_id,) + sql_cache_key
+            cached_response = result_cache.get(result_cache_key)
+            if cached_response is not None:
+                logger.debug("Using cached result for query")
+                return {**cached_response, "query": query}
+            
+            # Reuse SQL generated for the same question, table and dictionary
+            generated_sql = _generate_sql(
+                connection_id, query, table_name, full_table_name, dictionary_content, dictionary_hash
+            )
             
-            print(f"DEBUG: Generated SQL: {generated_sql}")
+            logger.debug("Generated SQL: %s", generated_sql)
         else:
             # No dictionary provided - throw error
             return {
@@ -102,39 +205,24 @@ def process_nl_query(connection_id: str, query: str, table_name: str, dictionary
             }
         
         # Step 3: Clean and validate the generated SQL
-        sql_cleaned = generated_sql.strip()
-        
         # Remove markdown code blocks if present
-        if sql_cleaned.startswith("```sql"):
-            sql_cleaned = sql_cleaned[6:]
-        if sql_cleaned.startswith("```"):
-            sql_cleaned = sql_cleaned[3:]
-        if sql_cleaned.endswith("```"):
-            sql_cleaned = sql_cleaned[:-3]
-        
-        sql_cleaned = sql_cleaned.strip()
+        fence_match = _FENCE_RE.match(generated_sql)
+        sql_cleaned = (fence_match.group(1) if fence_match else generated_sql).strip()
         
         # Step 4: Execute the generated SQL on Snowflake
-        conn = get_snowflake_connection(connection_id)
-        
         try:
-            # Add reasonable limit if not present
-            if "LIMIT" not in sql_cleaned.upper():
-                sql_cleaned = f"{sql_cleaned.rstrip(';')} LIMIT 100"
+            # Add reasonable limit if the outer query has none
+            sql_cleaned = ensure_limit(sql_cleaned)
             
             # Execute on Snowflake
-            cursor = conn.cursor()
-            cursor.execute(sql_cleaned)
-            rows = cursor.fetchall()
-            columns = [desc[0] for desc in cursor.description]
-            df = pd.DataFrame(rows, columns=columns)
-            cursor.close()
-            
-            # Convert results to JSON
-            result = df.to_dict(orient="records")
-            columns = list(df.columns)
+            with pooled_connection(connection_id) as conn:
+                cursor = conn.cursor()
+                cursor.execute(sql_cleaned)
+                # Row dicts straight from the Arrow result, without a DataFrame
+                columns, result = fetch_records(cursor)
+                cursor.close()
             
-            return {
+            response = {
                 "status": "success",
                 "intent": intent,
                 "query": query,
@@ -146,6 +234,9 @@ def process_nl_query(connection_id: str, query: str, table_name: str, dictionary
                 "row_count": len(result),
                 "message": f"Successfully executed query and returned {len(result)} rows"
             }
+            result_cache.set(result_cache_key, response)
+            
+            return response
             
         except Exception as sql_error:
             # SQL execution failed, return SQL but with error
@@ -170,8 +261,8 @@ def process_nl_query(connection_id: str, query: str, table_name: str, dictionary
 def generate_sql_only(connection_id: str, query: str, table_name: str, dictionary_content: str):
     """Generate SQL from natural language query without executing it"""
     try:
-        # Step 1: Classify intent
-        intent = llm_util.classify_intent(query)
+        # Step 1: Classify intent (cached per normalized query)
+        intent = _classify_intent(query)
         
         if intent.strip() != "SQL_QUERY":
             return {
@@ -181,6 +272,9 @@ def generate_sql_only(connection_id: str, query: str, table_name: str, dictionar
                 "query": query
             }
         
+        # Only SQL questions need sample rows; fetch them while the caches and prompt are checked
+        _prefetch_sample_data(connection_id, table_name, dictionary_content)
+        
         # Step 2: Generate SQL only (no execution)
         if not dictionary_content:
             return {
@@ -188,70 +282,21 @@ def generate_sql_only(connection_id: str, query: str, table_name: str, dictionar
                 "error": "Dictionary content is required for SQL generation"
             }
         
-        # Get connection for sample data
-        conn = get_snowflake_connection(connection_id)
-        conn_details = get_connection(connection_id)
-        database = conn_details.get("database", "")
-        schema = conn_details.get("schema", "")
-        
         # Construct full table name if needed
-        if "." not in table_name and database and schema:
-            full_table_name = f"{database}.{schema}.{table_name}"
-        else:
-            full_table_name = table_name
+        full_table_name = qualify_table_name(require_connection(connection_id), table_name)
         
-        # Create enriched prompt with sample data
-        try:
-            system_prompt_file_path = config.NL2SQL_SYSTEM_PROMPT_FILE
-            system_prompt = llm_util.load_prompt_file(system_prompt_file_path)
-            
-            # Get sample data from Snowflake table
-            sample_sql = f"SELECT * FROM {full_table_name} LIMIT 5"
-            cursor = conn.cursor()
-            cursor.execute(sample_sql)
-            sample_rows = cursor.fetchall()
-            sample_columns = [desc[0] for desc in cursor.description]
-            sample_df = pd.DataFrame(sample_rows, columns=sample_columns)
-            sample_data = sample_df.to_string(max_rows=5)
-            cursor.close()
-            
-            # Build comprehensive prompt
-            enriched_prompt = f"""
-            {system_prompt}
-            ## Database Dictionary -  
-            {dictionary_content}  
-            ## Table Name
-            {full_table_name}
-            ## Sample Data
-            {sample_data}
-            """
-            
-            # Call LLM with enriched prompt
-            nl2sql_user_prompt = f"Convert the following natural language question to SQL: {query}"
-            response = llm_util.call_response_api(llm_util.llm_model, enriched_prompt, nl2sql_user_prompt)
-            generated_sql = response.choices[0].message.content
-            
-        except Exception as sample_error:
-            print(f"DEBUG: Could not get sample data: {sample_error}")
-            # Fallback to basic dictionary without sample data
-            generated_sql = llm_util.create_sql_from_nl(
-                query, 
-                dictionary_content, 
-                table_name
-            )
+        # Generate SQL with the enriched prompt, shared with process_nl_query's cache
+        generated_sql = _generate_sql(
+            connection_id, query, table_name, full_table_name, dictionary_content,
+            _dictionary_hash(dictionary_content)
+        )
         
         # Clean up SQL (remove markdown, etc.)
-        sql_clean = re.sub(r'```sql\s*', '', generated_sql)
-        sql_clean = re.sub(r'```\s*', '', sql_clean)
-        sql_clean = sql_clean.strip()
-        
-        # Remove trailing semicolon if present
-        if sql_clean.endswith(';'):
-            sql_clean = sql_clean[:-1].strip()
+        fence_match = _FENCE_RE.match(generated_sql)
+        sql_clean = (fence_match.group(1) if fence_match else generated_sql).strip()
         
-        # Add LIMIT if not present
-        if "LIMIT" not in sql_clean.upper():
-            sql_clean += " LIMIT 100"
+        # Remove trailing semicolon and add LIMIT if the outer query has none
+        sql_clean = ensure_limit(sql_clean)
         
         return {
             "status": "success",
@@ -270,27 +315,77 @@ def generate_sql_only(connection_id: str, query: str, table_name: str, dictionar
         }
 
 
-def execute_sql_only(connection_id: str, sql: str, table_name: str):
-    """Execute a SQL query on Snowflake and return results"""
+def _execute_sql_arrow(connection_id: str, sql: str):
+    """Execute SQL and return the result as Arrow IPC stream bytes, with no pandas or row dicts"""
     try:
-        conn = get_snowflake_connection(connection_id)
+        import pyarrow as pa
+        
+        with pooled_connection(connection_id) as conn:
+            cursor = conn.cursor()
+            try:
+                cursor.execute(sql)
+                
+                # Write the connector's Arrow batches straight into one IPC stream
+                sink = pa.BufferOutputStream()
+                writer = None
+                row_count = 0
+                for table in cursor.fetch_arrow_batches():
+                    if writer is None:
+                        writer = pa.ipc.new_stream(sink, table.schema)
+                    writer.write_table(table)
+                    row_count += table.num_rows
+                if writer is None:
+                    # No batches for an empty result; still send a zero-row stream with the schema
+                    writer = pa.ipc.new_stream(sink, cursor.fetch_arrow_all(force_return_table=True).schema)
+                writer.close()
+            finally:
+                cursor.close()
         
-        print(f"DEBUG: Executing SQL: {sql}")
+        # Cached SHOW results, samples and answers may no longer match after CREATE/DROP/ALTER
+        if is_ddl(sql):
+            invalidate_shared_caches(connection_id)
+        
+        return {
+            "status": "success",
+            "sql": sql,
+            "media_type": "application/vnd.apache.arrow.stream",
+            "data": sink.getvalue().to_pybytes(),
+            "row_count": row_count
+        }
+        
+    except Exception as e:
+        logger.exception("Arrow SQL execution error")
+        return {
+            "status": "error",
+            "sql": sql,
+            "error": f"Error executing SQL as Arrow: {str(e)}"
+        }
+
+
+def execute_sql_only(connection_id: str, sql: str, table_name: str, result_format: str = "records"):
+    """Execute a SQL query on Snowflake and return results as row records or Arrow IPC bytes"""
+    if result_format == "arrow":
+        # Columnar callers skip row dicts entirely
+        return _execute_sql_arrow(connection_id, sql)
+    
+    try:
+        logger.debug("Executing SQL: %s", sql)
         
         # Execute SQL using cursor
-        cursor = conn.cursor()
-        cursor.execute(sql)
-        rows = cursor.fetchall()
-        columns = [desc[0] for desc in cursor.description]
-        df = pd.DataFrame(rows, columns=columns)
-        cursor.close()
+        with pooled_connection(connection_id) as conn:
+            cursor = conn.cursor()
+            cursor.execute(sql)
+            # Row dicts straight from the Arrow result, without a DataFrame
+            columns, result = fetch_records(cursor)
+            cursor.close()
         
-        # Convert to JSON-serializable format
-        result = df.to_dict(orient="records")
-        columns = list(df.columns)
-        row_count = len(df)
+        # Cached SHOW results, samples and answers may no longer match after CREATE/DROP/ALTER
+        if is_ddl(sql):
+            invalidate_shared_caches(connection_id)
         
-        print(f"DEBUG: SQL executed successfully, returned {row_count} rows")
+        row_count = len(result)
+        
+        logger.debug("SQL executed successfully, returned %d rows", row_count)
         
         return {
             "status": "success",
@@ -303,7 +398,7 @@ def execute_sql_only(connection_id: str, sql: str, table_name: str):
         }
         
     except Exception as e:
-        print(f"DEBUG: SQL execution error: {e}")
+        logger.exception("SQL execution error")
         return {
             "status": "error",
             "sql": sql,
@@ -335,4 +430,4 @@ def generate_query_summary(connection_id: str, query: str, sql: str, results: li
         return {
             "status": "error",
             "error": f"Error generating summary: {str(e)}"
-        }
\ No newline at end of file
+        }
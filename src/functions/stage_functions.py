@@ -2,35 +2,67 @@
 Stage functions - Core logic extracted from stage_router.py
 """
 
+import gzip
+import logging
 import tempfile
 import os
+import shutil
 import sys
+import yaml
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+from utils import llm_util
 
-from src.core.connection_utils import get_snowflake_connection
+from src.core.connection_utils import pooled_connection, shared_connection_ids
+from src.core.sql_utils import validate_stage_name, validate_file_name
+from src.core.ttl_cache import metadata_cache
+
+logger = logging.getLogger(__name__)
+
+# Stage transfers go through short-lived local files; keep them on tmpfs when it exists
+STAGE_TEMP_DIR = "/dev/shm" if os.path.isdir("/dev/shm") and os.access("/dev/shm", os.W_OK) else None
 
 
 def load_stage_file(connection_id: str, stage_name: str, file_name: str):
     """Load YAML data dictionary from Snowflake stage file"""
     try:
-        conn = get_snowflake_connection(connection_id)
-        cursor = conn.cursor()
+        validate_stage_name(stage_name)
+        validate_file_name(file_name)
         
-        print(f"DEBUG: Loading stage file {file_name} from {stage_name}")
+        logger.debug("Loading stage file %s from %s", file_name, stage_name)
         
-        # Read file content directly from stage as plain text
-        select_sql = f"""
-        SELECT $1 as content 
-        FROM '{stage_name}/{file_name}'
-        """
-        
-        cursor.execute(select_sql)
-        rows = cursor.fetchall()
-        content = "\n".join([row[0] for row in rows if row[0]])
-        
-        cursor.close()
+        # GET downloads the raw file through cloud services - no warehouse, no CSV
+        # parsing that would split lines on delimiters, and a single round trip
+        download_dir = tempfile.mkdtemp(dir=STAGE_TEMP_DIR)
+        try:
+            normalized_dir = download_dir.replace('\\', '/')
+            with pooled_connection(connection_id) as conn:
+                cursor = conn.cursor()
+                cursor.execute(f"GET '{stage_name}/{file_name}' 'file://{normalized_dir}/'")
+                cursor.close()
+            
+            # GET matches by prefix, so pick out the exact file that was asked for, and only
+            # fall back to its gzip-compressed form when the plain file is not there
+            requested_name = os.path.basename(file_name)
+            downloaded = os.listdir(download_dir)
+            if requested_name in downloaded:
+                local_name = requested_name
+            elif requested_name + ".gz" in downloaded:
+                local_name = requested_name + ".gz"
+            else:
+                return {
+                    "status": "error",
+                    "error": f"Stage file not found: {stage_name}/{file_name}"
+                }
+            
+            # Decode by what was actually downloaded, so a name ending in .gz is read as gzip
+            local_path = os.path.join(download_dir, local_name)
+            opener = gzip.open if local_name.endswith(".gz") else open
+            with opener(local_path, 'rb') as local_file:
+                content = local_file.read().decode('utf-8')
+        finally:
+            shutil.rmtree(download_dir, ignore_errors=True)
         
-        print(f"DEBUG: Loaded {len(content)} characters from stage file")
+        logger.debug("Loaded %s characters from stage file", len(content))
         
         # Validate that it's YAML content
         if not content.strip():
@@ -39,8 +71,15 @@ def load_stage_file(connection_id: str, stage_name: str, file_name: str):
                 "error": "Stage file is empty"
             }
         
-        # Basic YAML validation - check for common YAML indicators
-        if not any(indicator in content for indicator in [':', '-', 'fields:', 'tables:', 'columns:']):
+        # Parsing is the validation, and callers get the parsed dictionary without re-parsing
+        try:
+            parsed = llm_util.load_yaml(content)
+        except yaml.YAMLError as yaml_error:
+            return {
+                "status": "error",
+                "error": f"Invalid YAML: {yaml_error}"
+            }
+        if not isinstance(parsed, dict):
             return {
                 "status": "error",
                 "error": "File does not appear to be a valid YAML data dictionary"
@@ -48,64 +87,110 @@ def load_stage_file(connection_id: str, stage_name: str, file_name: str):
         
         return {
             "status": "success",
-            "content": content
+            "content": content,
+            "parsed": parsed
         }
         
     except Exception as e:
-        print(f"DEBUG: Error loading stage file: {e}")
+        logger.debug("Error loading stage file: %s", e)
         return {
             "status": "error",
             "error": f"Error loading stage file: {str(e)}"
         }
 
 
+def _put_file_to_stage(connection_id: str, stage_name: str, local_path: str, content_size: int):
+    """PUT one local file to a stage and build the save response from the PUT result"""
+    # Use Snowflake's PUT command to upload the file to the stage
+    # Convert Windows path to proper format and escape backslashes
+    normalized_path = local_path.replace('\\', '/')
+    # Gzip on upload: YAML is highly repetitive, so far fewer bytes cross the network.
+    # The staged name gains a .gz suffix, which listings and load_stage_file both accept
+    put_command = f"PUT 'file://{normalized_path}' {stage_name} OVERWRITE=TRUE AUTO_COMPRESS=TRUE"
+    logger.debug("Executing PUT command: %s", put_command)
+    with pooled_connection(connection_id) as conn:
+        cursor = conn.cursor()
+        cursor.execute(put_command)
+        
+        # PUT reports one row per file (source, target, sizes, compression, status,
+        # message), so the upload is verified without a separate LIST of the stage
+        put_result = cursor.fetchone()
+        cursor.close()
+    
+    logger.debug("PUT result: %s", put_result)
+    # Stage listings are cached per connection; the new file must show up in every
+    # listing for the same account, not just this connection's
+    for cid in shared_connection_ids(connection_id):
+        metadata_cache.invalidate(cid, "stage_files")
+    if not put_result or put_result[6] not in ("UPLOADED", "SKIPPED"):
+        return {
+            "status": "error",
+            "error": f"Upload to {stage_name} failed: {put_result[7] if put_result else 'no result'}"
+        }
+    
+    # PUT reports the target name, which carries a .gz suffix once compressed
+    actual_filename = put_result[1]
+    
+    return {
+        "status": "success", 
+        "message": f"YAML dictionary uploaded to {stage_name}/{actual_filename}",
+        "stage_name": stage_name,
+        "file_name": actual_filename,
+        "content_size": content_size,
+        "source_size": put_result[2],
+        "compressed_size": put_result[3]
+    }
+
+
 def save_dictionary_to_stage(connection_id: str, stage_name: str, file_name: str, yaml_content: str):
     """Save YAML data dictionary to a Snowflake stage"""
     try:
-        conn = get_snowflake_connection(connection_id)
-        cursor = conn.cursor()
-        
-        # Write YAML content to a temporary local file with the desired name
-        temp_dir = tempfile.gettempdir()
-        temp_file_path = os.path.join(temp_dir, file_name)
+        validate_stage_name(stage_name)
+        validate_file_name(file_name)
         
-        with open(temp_file_path, 'w') as temp_file:
-            temp_file.write(yaml_content)
+        # Write YAML content to a file with the desired name in a private temp directory,
+        # so PUT uploads it under that name and concurrent saves never share a path
+        temp_dir = tempfile.mkdtemp(dir=STAGE_TEMP_DIR)
+        temp_file_path = os.path.join(temp_dir, os.path.basename(file_name))
         
         try:
-            # Use Snowflake's PUT command to upload the file to the stage
-            # Convert Windows path to proper format and escape backslashes
-            normalized_path = temp_file_path.replace('\\', '/')
-            put_command = f"PUT 'file://{normalized_path}' {stage_name} OVERWRITE=TRUE AUTO_COMPRESS=FALSE"
-            print(f"DEBUG: Executing PUT command: {put_command}")
-            cursor.execute(put_command)
+            with open(temp_file_path, 'w') as temp_file:
+                temp_file.write(yaml_content)
             
-            # Since we created the temp file with the desired name, it should upload with the correct name
-            actual_filename = file_name
-            
-            # Verify the upload by listing the stage
-            cursor.execute(f"LIST {stage_name}")
-            files = cursor.fetchall()
-            print(f"DEBUG: Files in stage after upload: {[f[0] for f in files]}")
-            
-            cursor.close()
+            return _put_file_to_stage(connection_id, stage_name, temp_file_path, len(yaml_content))
             
+        finally:
+            # Clean up temporary directory and file
+            shutil.rmtree(temp_dir, ignore_errors=True)
+        
+    except Exception as e:
+        logger.debug("Error saving dictionary to stage: %s", e)
+        return {
+            "status": "error",
+            "error": f"Error saving dictionary to stage: {str(e)}"
+        }
+
+
+def save_dictionary_file_to_stage(connection_id: str, stage_name: str, file_path: str):
+    """Upload a YAML data dictionary file straight from disk, without reading it into memory"""
+    try:
+        validate_stage_name(stage_name)
+        validate_file_name(os.path.basename(file_path))
+        if "'" in file_path:
+            raise ValueError(f"Invalid file path: {file_path}")  # Quoted in the PUT command
+        
+        if not os.path.isfile(file_path):
             return {
-                "status": "success", 
-                "message": f"YAML dictionary uploaded to {stage_name}/{actual_filename}",
-                "stage_name": stage_name,
-                "file_name": actual_filename,
-                "content_size": len(yaml_content)
+                "status": "error",
+                "error": f"File not found: {file_path}"
             }
-            
-        finally:
-            # Clean up temporary file
-            if os.path.exists(temp_file_path):
-                os.unlink(temp_file_path)
+        
+        return _put_file_to_stage(connection_id, stage_name, os.path.abspath(file_path),
+                                  os.path.getsize(file_path))
         
     except Exception as e:
-        print(f"DEBUG: Error saving dictionary to stage: {e}")
+        logger.debug("Error saving dictionary to stage: %s", e)
         return {
             "status": "error",
             "error": f"Error saving dictionary to stage: {str(e)}"
-        }
\ No newline at end of file
+        }
@@ -5,17 +5,29 @@ These functions are preserved for future use but are not currently used by any C
 
 import sys
 import os
+import logging
 from pathlib import Path as PathlibPath
-from typing import Optional
+from typing import Any, Dict, Iterator, List, Optional
 import pandas as pd
+from snowflake.connector import DictCursor
 
 # Add the project root to the path for imports
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
 from utils import llm_util
 
-from src.core.connection_utils import get_snowflake_connection, get_connection, remove_connection
+from src.core.connection_utils import (
+    close_connection_data, db_executor, get_connection, invalidate_shared_caches, ping_connection, pooled_connection,
+    remove_connection
+)
+from src.core.sql_utils import ensure_limit, is_ddl
+from src.core.ttl_cache import metadata_cache
+from src.functions.metadata_functions import (
+    SHOW_PAGE_SIZE, _load_databases, _show_tables_in_database, _table_info
+)
 from src.functions.query_functions import process_nl_query
 
+logger = logging.getLogger(__name__)
+
 
 def check_connection_status(connection_id: str):
     """
@@ -33,11 +45,7 @@ def check_connection_status(connection_id: str):
         }
     
     try:
-        conn = connection_data["connection"]
-        cursor = conn.cursor()
-        cursor.execute("SELECT 1")
-        cursor.fetchone()
-        cursor.close()
+        ping_connection(connection_data)
         
         return {
             "status": "connected",
@@ -47,6 +55,7 @@ def check_connection_status(connection_id: str):
         }
     except Exception as e:
         # Clean up dead connection
+        close_connection_data(connection_data)
         remove_connection(connection_id)
         return {
             "status": "error",
@@ -62,27 +71,9 @@ def nl2sql_and_execute(connection_id: str, query: str, table_name: str, dictiona
     REASON: CLIs use separate generate-sql and execute-sql endpoints for better control
     POTENTIAL USE: Single-step NL2SQL execution for simple applications
     """
-    try:
-        # Use the existing query function to process NL2SQL
-        query_result = process_nl_query(connection_id, query, table_name, dictionary_content)
-        
-        # If SQL was successfully generated and executed, return the complete result
-        if query_result.get("execution_status") == "success":
-            return query_result
-        
-        # If SQL was generated but execution failed, return the error
-        elif query_result.get("execution_status") == "failed":
-            return query_result
-            
-        # If it's not a SQL query, return the classification result
-        else:
-            return query_result
-            
-    except Exception as e:
-        return {
-            "status": "error",
-            "error": f"Error in NL2SQL pipeline: {str(e)}"
-        }
+    # process_nl_query already returns the success, failed-execution and non-SQL results
+    # (and catches its own errors), so hand its result straight back
+    return process_nl_query(connection_id, query, table_name, dictionary_content)
 
 
 def execute_sql_simple(connection_id: str, sql: str, limit: Optional[int] = 1000):
@@ -94,18 +85,21 @@ def execute_sql_simple(connection_id: str, sql: str, limit: Optional[int] = 1000
     POTENTIAL USE: Simple SQL execution without detailed error handling
     """
     try:
-        conn = get_snowflake_connection(connection_id)
-        
-        # Add LIMIT if not present and limit is specified
-        if limit and "LIMIT" not in sql.upper():
-            sql = f"{sql.rstrip(';')} LIMIT {limit}"
+        # Add LIMIT if the outer query has none and limit is specified
+        if limit:
+            sql = ensure_limit(sql, limit)
         
         # Execute query using cursor instead of pandas to avoid SQLAlchemy warning
-        cursor = conn.cursor()
-        cursor.execute(sql)
-        rows = cursor.fetchall()
-        columns = [desc[0] for desc in cursor.description]
-        cursor.close()
+        with pooled_connection(connection_id) as conn:
+            cursor = conn.cursor()
+            cursor.execute(sql)
+            rows = cursor.fetchall()
+            columns = [desc[0] for desc in cursor.description]
+            cursor.close()
+        
+        # Cached SHOW results, samples and answers may no longer match after CREATE/DROP/ALTER
+        if is_ddl(sql):
+            invalidate_shared_caches(connection_id)
         
         # Convert to list of dictionaries
         result = [dict(zip(columns, row)) for row in rows]
@@ -121,4 +115,253 @@ def execute_sql_simple(connection_id: str, sql: str, limit: Optional[int] = 1000
         return {
             "status": "error",
             "error": f"Error executing SQL: {str(e)}"
-        }
\ No newline at end of file
+        }
+
+
+def list_catalog(connection_id: str, databases: Optional[List[str]] = None):
+    """
+    List tables across databases, issuing one SHOW TABLES per database in parallel
+    
+    UNUSED: Not called by any CLI applications
+    REASON: CLIs browse one database and schema at a time
+    POTENTIAL USE: Catalog search, building a full table index up front
+    """
+    try:
+        if databases is None:
+            with pooled_connection(connection_id) as conn:
+                cursor = conn.cursor(DictCursor)
+                cursor.execute("SHOW DATABASES")
+                databases = [row["name"] for row in cursor.fetchall()]
+                cursor.close()
+        
+        catalog = {}
+        if databases:
+            # Each worker checks out its own pooled session, so the wall clock is
+            # bounded by the slowest database rather than the sum of all of them
+            futures = {db: db_executor.submit(_show_tables_in_database, connection_id, db) for db in databases}
+            
+            for database, future in futures.items():
+                try:
+                    catalog[database] = future.result()
+                except Exception as db_error:
+                    catalog[database] = {"error": str(db_error)}
+        
+        return {
+            "status": "success",
+            "catalog": catalog
+        }
+    except Exception as e:
+        return {
+            "status": "error",
+            "error": f"Error listing catalog: {str(e)}"
+        }
+
+
+def _load_account_objects(connection_id: str, object_type: str):
+    """Run SHOW TERSE <object_type> IN ACCOUNT on a pooled connection"""
+    with pooled_connection(connection_id) as conn:
+        cursor = conn.cursor(DictCursor)
+        try:
+            cursor.execute(f"SHOW TERSE {object_type} IN ACCOUNT")
+            return cursor.fetchall()
+        finally:
+            cursor.close()
+
+
+def get_metadata_tree(connection_id: str, depth: int = 2):
+    """
+    Databases, their schemas (depth >= 1) and tables (depth >= 2) from at most three parallel SHOWs
+    
+    UNUSED: Not called by any CLI applications
+    REASON: CLIs list databases, schemas and tables one level at a time as the user picks them
+    POTENTIAL USE: Tree views of the whole account in a UI
+    """
+    try:
+        loaders = {
+            "databases": lambda: metadata_cache.get_or_load(
+                (connection_id, "databases"),
+                lambda: _load_databases(connection_id)
+            )
+        }
+        if depth >= 1:
+            loaders["schemas"] = lambda: metadata_cache.get_or_load(
+                (connection_id, "account_schemas"),
+                lambda: _load_account_objects(connection_id, "SCHEMAS")
+            )
+        if depth >= 2:
+            loaders["tables"] = lambda: metadata_cache.get_or_load(
+                (connection_id, "account_tables"),
+                lambda: _load_account_objects(connection_id, "TABLES")
+            )
+        
+        # One pooled session per SHOW, so the levels cost one round-trip of wall clock
+        futures = {level: db_executor.submit(loader) for level, loader in loaders.items()}
+        results = {level: future.result() for level, future in futures.items()}
+        
+        tree = {database: {} for database in results["databases"]}
+        for row in results.get("schemas", []):
+            if row["database_name"] in tree:
+                tree[row["database_name"]][row["name"]] = []
+        for row in results.get("tables", []):
+            schemas = tree.get(row["database_name"])
+            if schemas is not None and row["schema_name"] in schemas:
+                schemas[row["schema_name"]].append(_table_info(row))
+        
+        databases = []
+        for database, schemas in tree.items():
+            database_node = {"name": database}
+            if depth >= 1:
+                database_node["schemas"] = []
+                for schema, tables in schemas.items():
+                    schema_node = {"name": schema}
+                    if depth >= 2:
+                        schema_node["tables"] = tables
+                    database_node["schemas"].append(schema_node)
+            databases.append(database_node)
+        
+        return {
+            "status": "success",
+            "databases": databases,
+            # SHOW ... IN ACCOUNT stops at SHOW_PAGE_SIZE rows
+            "truncated": any(len(rows) >= SHOW_PAGE_SIZE for level, rows in results.items() if level != "databases")
+        }
+    except Exception as e:
+        return {
+            "status": "error",
+            "error": f"Error building metadata tree: {str(e)}"
+        }
+
+
+def list_all_tables(connection_id: str, database: str):
+    """
+    List tables in every schema of a database with one SHOW TABLES, grouped by schema
+    
+    UNUSED: Not called by any CLI applications
+    REASON: CLIs list the tables of the one schema the user selected
+    POTENTIAL USE: Database-wide table pickers; also warms list_tables for every schema
+    """
+    try:
+        tables_by_schema = {}
+        for table in _show_tables_in_database(connection_id, database):
+            tables_by_schema.setdefault(table["schema"], []).append(table)
+        
+        return {
+            "status": "success",
+            "database": database,
+            "tables": tables_by_schema
+        }
+    except Exception as e:
+        return {
+            "status": "error",
+            "error": f"Error listing tables: {str(e)}"
+        }
+
+
+def submit_sql_async(connection_id: str, sql: str):
+    """
+    Submit SQL for server-side execution and return its query ID without waiting for results
+    
+    UNUSED: Not called by any CLI applications
+    REASON: CLIs run queries synchronously through execute_sql_only
+    POTENTIAL USE: Long-running queries polled with get_async_query_results
+    """
+    try:
+        with pooled_connection(connection_id) as conn:
+            cursor = conn.cursor()
+            cursor.execute_async(sql)
+            query_id = cursor.sfqid
+            cursor.close()
+        
+        # Drop cached metadata now; the DDL may finish before the next listing
+        if is_ddl(sql):
+            invalidate_shared_caches(connection_id)
+        
+        logger.debug("Submitted async query %s", query_id)
+        
+        return {
+            "status": "success",
+            "sql": sql,
+            "query_id": query_id
+        }
+        
+    except Exception as e:
+        logger.exception("Async SQL submit error")
+        return {
+            "status": "error",
+            "sql": sql,
+            "error": f"Error submitting SQL: {str(e)}"
+        }
+
+
+def get_async_query_results(connection_id: str, query_id: str):
+    """
+    Check an async query and return its results once Snowflake reports it finished
+    
+    UNUSED: Not called by any CLI applications
+    REASON: Nothing submits queries with submit_sql_async
+    POTENTIAL USE: Polling long-running queries without holding a session open
+    """
+    try:
+        # Query IDs are account-wide, so any pooled session of this connection can poll them
+        with pooled_connection(connection_id) as conn:
+            query_status = conn.get_query_status_throw_if_error(query_id)
+            if conn.is_still_running(query_status):
+                return {
+                    "status": "success",
+                    "query_id": query_id,
+                    "execution_status": "running",
+                    "query_status": query_status.name
+                }
+            
+            cursor = conn.cursor()
+            cursor.get_results_from_sfqid(query_id)
+            rows = cursor.fetchall()
+            columns = [desc[0] for desc in cursor.description]
+            cursor.close()
+        
+        result = [dict(zip(columns, row)) for row in rows]
+        row_count = len(result)
+        
+        return {
+            "status": "success",
+            "query_id": query_id,
+            "execution_status": "success",
+            "columns": columns,
+            "result": result,
+            "row_count": row_count
+        }
+        
+    except Exception as e:
+        logger.exception("Async query status error")
+        return {
+            "status": "error",
+            "query_id": query_id,
+            "execution_status": "failed",
+            "error": f"Error getting query results: {str(e)}"
+        }
+
+
+def stream_sql_results(connection_id: str, sql: str, batch_size: int = 1000) -> Iterator[List[Dict[str, Any]]]:
+    """
+    Execute SQL and yield the result as lists of row dicts, batch_size rows at a time
+    
+    Unlike execute_sql_only, memory stays bounded by one batch and the first rows are
+    available as soon as Snowflake returns them. The pooled connection is held until the
+    generator is exhausted or closed.
+    
+    UNUSED: Not called by any CLI applications
+    REASON: CLIs show whole (LIMITed) results returned by execute_sql_only
+    POTENTIAL USE: Exporting or paging through large result sets
+    """
+    with pooled_connection(connection_id) as conn:
+        cursor = conn.cursor()
+        try:
+            cursor.execute(sql)
+            columns = [desc[0] for desc in cursor.description]
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield [dict(zip(columns, row)) for row in rows]
+        finally:
+            cursor.close()
@@ -0,0 +1,249 @@
+"""
+Tests for the Snowflake connection pool, with the connector's connect() stubbed out
+"""
+
+import sys
+import os
+import threading
+import time
+
+import pytest
+
+pytest.importorskip("snowflake.connector")
+
+# Add the project root to the path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.core import connection_pool
+from src.core.connection_pool import SnowflakeConnectionPool
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self._conn = conn
+
+    def execute(self, sql):
+        if self._conn.broken:
+            raise Exception("Session no longer exists")
+        self._conn.executed.append(sql)
+
+    def fetchone(self):
+        return (1,)
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self):
+        self.closed = False
+        self.broken = False
+        self.executed = []
+
+    def is_closed(self):
+        return self.closed
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def opened(monkeypatch):
+    """Connections handed out by the stubbed snowflake.connector.connect, in order"""
+    connections = []
+
+    def connect(**conn_params):
+        conn = FakeConnection()
+        connections.append(conn)
+        return conn
+
+    monkeypatch.setattr(connection_pool.snowflake.connector, "connect", connect)
+    return connections
+
+
+def test_released_connection_is_reused(opened):
+    pool = SnowflakeConnectionPool({}, max_size=2)
+    with pool.connection() as first:
+        pass
+    with pool.connection() as second:
+        pass
+
+    assert first is second
+    assert len(opened) == 1
+    assert pool.size == 1
+
+
+def test_pool_grows_up_to_max_size_then_times_out(opened):
+    pool = SnowflakeConnectionPool({}, max_size=2, timeout=0.1)
+    pool.acquire()
+    pool.acquire()
+
+    assert pool.size == 2
+    with pytest.raises(Exception, match="Timed out"):
+        pool.acquire()
+
+
+def test_waiter_gets_the_connection_released_by_another_thread(opened):
+    pool = SnowflakeConnectionPool({}, max_size=1, timeout=5)
+    conn = pool.acquire()
+    acquired = []
+
+    waiter = threading.Thread(target=lambda: acquired.append(pool.acquire()))
+    waiter.start()
+    time.sleep(0.1)
+    pool.release(conn)
+    waiter.join(5)
+
+    assert acquired == [conn]
+    assert len(opened) == 1
+
+
+def test_waiter_opens_a_new_connection_when_a_dead_one_is_discarded(opened):
+    pool = SnowflakeConnectionPool({}, max_size=1, timeout=5)
+    conn = pool.acquire()
+    acquired = []
+
+    waiter = threading.Thread(target=lambda: acquired.append(pool.acquire()))
+    waiter.start()
+    time.sleep(0.1)
+    # Releasing a dead session frees its slot; the waiter must not sleep out its timeout
+    started = time.monotonic()
+    conn.close()
+    pool.release(conn)
+    waiter.join(5)
+
+    assert time.monotonic() - started < 1
+    assert len(acquired) == 1 and acquired[0] is not conn
+    assert pool.size == 1
+
+
+def test_close_wakes_waiters(opened):
+    pool = SnowflakeConnectionPool({}, max_size=1, timeout=5)
+    pool.acquire()
+    errors = []
+
+    def wait_for_connection():
+        try:
+            pool.acquire()
+        except Exception as error:
+            errors.append(str(error))
+
+    waiter = threading.Thread(target=wait_for_connection)
+    waiter.start()
+    time.sleep(0.1)
+    pool.close()
+    waiter.join(1)
+
+    assert errors == ["Connection pool is closed"]
+
+
+def test_closed_connection_is_dropped_on_release(opened):
+    pool = SnowflakeConnectionPool({}, max_size=2)
+    conn = pool.acquire()
+    conn.close()
+    pool.release(conn)
+
+    assert pool.size == 0
+    assert pool.acquire() is not conn
+
+
+def test_stale_idle_connection_is_pinged_and_replaced_when_dead(opened, monkeypatch):
+    pool = SnowflakeConnectionPool({}, max_size=2)
+    conn = pool.acquire()
+    pool.release(conn)
+
+    # Pretend the session has been idle past the keep-alive heartbeat, and that it died
+    monkeypatch.setattr(connection_pool, "POOL_PRE_PING_IDLE", 0)
+    conn.broken = True
+
+    replacement = pool.acquire()
+    assert replacement is not conn
+    assert conn.closed
+    assert pool.size == 1
+
+
+def test_stale_idle_connection_that_answers_the_ping_is_reused(opened, monkeypatch):
+    pool = SnowflakeConnectionPool({}, max_size=2)
+    conn = pool.acquire()
+    pool.release(conn)
+
+    monkeypatch.setattr(connection_pool, "POOL_PRE_PING_IDLE", 0)
+    assert pool.acquire() is conn
+    assert conn.executed == ["SELECT 1"]
+
+
+def test_ping_idle_never_opens_a_connection(opened):
+    pool = SnowflakeConnectionPool({}, max_size=2)
+    assert pool.ping_idle() is None
+    assert opened == []
+
+
+def test_ping_idle_checks_an_idle_connection_and_keeps_it(opened):
+    pool = SnowflakeConnectionPool({}, max_size=2)
+    conn = pool.acquire()
+    pool.release(conn)
+
+    assert pool.ping_idle() is True
+    assert pool.acquire() is conn
+    assert len(opened) == 1
+
+
+def test_ping_idle_reports_dead_idle_connections(opened, monkeypatch):
+    pool = SnowflakeConnectionPool({}, max_size=2)
+    conn = pool.acquire()
+    pool.release(conn)
+
+    monkeypatch.setattr(connection_pool, "POOL_PRE_PING_IDLE", 0)
+    conn.broken = True
+
+    assert pool.ping_idle() is False
+    assert conn.closed
+    assert pool.size == 0
+    assert len(opened) == 1
+
+
+def test_trim_idle_keeps_the_most_recent_connection(opened):
+    pool = SnowflakeConnectionPool({}, max_size=3)
+    connections = [pool.acquire() for _ in range(3)]
+    for conn in connections:
+        pool.release(conn)
+
+    assert pool.trim_idle(max_idle=0) == 2
+    assert pool.size == 1
+    assert pool.acquire() is connections[-1]
+
+
+def test_close_closes_idle_and_later_released_connections(opened):
+    pool = SnowflakeConnectionPool({}, max_size=2)
+    idle = pool.acquire()
+    checked_out = pool.acquire()
+    pool.release(idle)
+
+    pool.close()
+    assert idle.closed
+    assert not checked_out.closed
+
+    pool.release(checked_out)
+    assert checked_out.closed
+    assert pool.size == 0
+    with pytest.raises(Exception, match="closed"):
+        pool.acquire()
+
+
+def test_shared_pools_are_reference_counted_per_credentials(opened):
+    params = {"account": "acct", "user": "user"}
+    first = connection_pool.acquire_shared_pool(params)
+    second = connection_pool.acquire_shared_pool(dict(params))
+    assert first is second
+
+    key = connection_pool.credential_key(params)
+    connection_pool.release_shared_pool(key)
+    assert connection_pool.acquire_shared_pool(params) is first
+
+    connection_pool.release_shared_pool(key)
+    connection_pool.release_shared_pool(key)
+    assert connection_pool.acquire_shared_pool(params) is not first
+    connection_pool.release_shared_pool(key)
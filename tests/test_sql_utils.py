@@ -0,0 +1,38 @@
+"""
+Tests for SQL statement classification
+"""
+
+import sys
+import os
+
+import pytest
+
+pytest.importorskip("sqlglot")
+
+# Add the project root to the path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.core.sql_utils import is_ddl
+
+
+@pytest.mark.parametrize("sql", [
+    "DROP TABLE t",
+    "  create or replace view v as select 1",
+    "-- clean up\nDROP TABLE t",
+    "/* rebuild */ CREATE TABLE t (a INT)",
+    "/* multi\nline */\n  ALTER TABLE t RENAME TO u",
+    "// note\nUNDROP TABLE t",
+])
+def test_ddl_is_detected_after_leading_comments(sql):
+    assert is_ddl(sql)
+
+
+@pytest.mark.parametrize("sql", [
+    "SELECT 1",
+    "SELECT created FROM t",
+    "-- DROP TABLE t\nSELECT 1",
+    "/* DROP TABLE t */ SELECT 1",
+    "-- only a comment",
+])
+def test_queries_and_commented_out_ddl_are_not_ddl(sql):
+    assert not is_ddl(sql)
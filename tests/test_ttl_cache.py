@@ -0,0 +1,122 @@
+"""
+Tests for the in-process TTL cache
+"""
+
+import sys
+import os
+import threading
+import time
+
+# Add the project root to the path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.core.ttl_cache import TTLCache
+
+
+def test_get_returns_default_when_missing():
+    cache = TTLCache(maxsize=4, ttl=60)
+    assert cache.get("missing") is None
+    assert cache.get("missing", "default") == "default"
+
+
+def test_entries_expire_after_ttl():
+    cache = TTLCache(maxsize=4, ttl=0.05)
+    cache.set("key", "value")
+    assert cache.get("key") == "value"
+    time.sleep(0.1)
+    assert cache.get("key") is None
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    # Reading "a" makes "b" the least recently used
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+
+
+def test_invalidate_drops_only_matching_prefix():
+    cache = TTLCache(maxsize=8, ttl=60)
+    cache.set(("conn1", "tables", "DB"), 1)
+    cache.set(("conn1", "stage_files", "@S"), 2)
+    cache.set(("conn2", "tables", "DB"), 3)
+
+    assert cache.invalidate("conn1", "stage_files") == 1
+    assert cache.get(("conn1", "tables", "DB")) == 1
+
+    assert cache.invalidate("conn1") == 1
+    assert cache.get(("conn2", "tables", "DB")) == 3
+
+    assert cache.invalidate() == 1
+    assert cache.get(("conn2", "tables", "DB")) is None
+
+
+def test_get_or_load_caches_the_loaded_value():
+    cache = TTLCache(maxsize=4, ttl=60)
+    calls = []
+
+    def loader():
+        calls.append(1)
+        return "value"
+
+    assert cache.get_or_load("key", loader) == "value"
+    assert cache.get_or_load("key", loader) == "value"
+    assert len(calls) == 1
+
+
+def test_get_or_load_runs_one_loader_for_concurrent_misses():
+    cache = TTLCache(maxsize=4, ttl=60)
+    calls = []
+    release = threading.Event()
+
+    def loader():
+        calls.append(1)
+        release.wait(5)
+        return "value"
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get_or_load("key", loader)))
+               for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    # Give every thread time to reach the in-flight load before it finishes
+    time.sleep(0.1)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert len(calls) == 1
+    assert results == ["value"] * 8
+
+
+def test_get_or_load_error_reaches_waiters_and_is_not_cached():
+    cache = TTLCache(maxsize=4, ttl=60)
+    release = threading.Event()
+
+    def failing_loader():
+        release.wait(5)
+        raise ValueError("load failed")
+
+    errors = []
+
+    def load():
+        try:
+            cache.get_or_load("key", failing_loader)
+        except ValueError as error:
+            errors.append(str(error))
+
+    threads = [threading.Thread(target=load) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.1)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert errors == ["load failed"] * 4
+    # The failure is not remembered, so the next call loads again
+    assert cache.get_or_load("key", lambda: "recovered") == "recovered"
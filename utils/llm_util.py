@@ -1,5 +1,6 @@
 import os
 import re
+from functools import lru_cache
 import streamlit as st
 import pathlib
 import sys
@@ -7,6 +8,11 @@ from openai import OpenAI
 from dotenv import load_dotenv
 import pandas as pd
 import yaml
+try:
+    # libyaml C bindings parse large dictionaries much faster than the pure Python loader
+    from yaml import CSafeLoader as YamlSafeLoader
+except ImportError:
+    from yaml import SafeLoader as YamlSafeLoader
 from google.protobuf.json_format import ParseDict
 from utils.schema.semantic_model_pb2 import SemanticModel
 from protobuf_to_pydantic import msg_to_pydantic_model
@@ -28,6 +34,11 @@ client = OpenAI(api_key=api_key)
 PydanticSemanticModel = msg_to_pydantic_model(ProtoSemanticModel)
 
 
+def load_yaml(yaml_text):
+    """yaml.safe_load using the C loader when libyaml is available"""
+    return yaml.load(yaml_text, Loader=YamlSafeLoader)
+
+
 def call_response_api(llm_model, system_prompt, user_prompt):
     response = client.chat.completions.create(
         model=f"{llm_model}",
@@ -38,13 +49,18 @@ def call_response_api(llm_model, system_prompt, user_prompt):
     )
     return response
 
+@lru_cache(maxsize=None)
+def _read_prompt_file(prompt_path):
+    """Read a prompt file once per process; failures raise and are not cached"""
+    with open(prompt_path, 'r', encoding='utf-8') as file:
+        return file.read()
+
 def load_prompt_file(file_path):
     try:
         # Use project root for system prompts
         #project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
         prompt_path = file_utils.resolve_prompt_path(config.SYSTEM_PROMPTS_DIR, file_path)
-        with open(prompt_path, 'r', encoding='utf-8') as file:
-            content = file.read()
+        content = _read_prompt_file(prompt_path)
         return content
 
     except FileNotFoundError:
@@ -52,6 +68,11 @@ def load_prompt_file(file_path):
     except Exception as e:
         return f"Error: {str(e)}"
 
+def preload_prompt_files(*file_paths):
+    """Read prompt files ahead of the first request so the hot path is a cache hit"""
+    for file_path in file_paths:
+        load_prompt_file(file_path)
+
 def normalize_user_input(user_input):
    """Normalize user input for consistent caching"""
    if not user_input:
@@ -169,7 +190,7 @@ def generate_enhanced_data_dictionary(sample_data_path):
 
         # Validate YAML before returning
         try:
-            yaml.safe_load(yaml_text)
+            load_yaml(yaml_text)
         except yaml.YAMLError as e:
             print(f"YAML validation error: {e}")
             return None
@@ -218,11 +239,12 @@ def convert_sample_values_to_strings(data):
     return data
 def validate_yaml_with_proto(yaml_str):
     """
-    Validates a YAML string against the SemanticModel protobuf schema.
-    Returns (True, None) if valid, (False, error_message) if not.
+    Validates a YAML string, or an already parsed YAML document, against the SemanticModel
+    protobuf schema. Returns (True, None) if valid, (False, error_message) if not.
     """
     try:
-        data = yaml.safe_load(yaml_str)
+        data = load_yaml(yaml_str) if isinstance(yaml_str, str) else yaml_str
+        # Copies the document, so the in-place sampleValues conversion leaves the caller's alone
         data = convert_dates_to_strings(data)
         data = convert_sample_values_to_strings(data)
         # Convert YAML dict to protobuf